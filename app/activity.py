@@ -0,0 +1,129 @@
+import asyncio
+import datetime as dt
+from collections import Counter
+from typing import Dict, Iterator, List, Tuple
+
+from sqlalchemy import update, values, column, String, BigInteger, DateTime
+from sqlalchemy.dialects.postgresql import insert
+
+from app.config import ACTIVITY_FLUSH_INTERVAL, ACTIVITY_MAX_PENDING, ACTIVITY_MAX_BUFFER
+from app.logger import logger
+from app.db.session import SessionLocal
+from app.db.models import ProductStats, User
+
+
+class ActivityBuffer:
+    # Просмотры и последняя активность копятся в памяти и пишутся в БД пачкой:
+    # горячий путь (показ карточки, любой апдейт) никогда не ждёт записи.
+    def __init__(self, flush_interval: int, max_pending: int, max_buffer: int) -> None:
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_buffer = max_buffer
+        self.dropped = 0
+        self.views: Counter = Counter()
+        self.last_seen: Dict[Tuple[str, int], dt.datetime] = {}
+        self.lock = asyncio.Lock()
+        self.overflow = asyncio.Event()
+
+    def pending(self) -> int:
+        return len(self.views) + len(self.last_seen)
+
+    def has_room(self, buffer: dict, key) -> bool:
+        if key in buffer or self.pending() < self.max_buffer:
+            return True
+        self.dropped += 1
+        return False
+
+    def record_view(self, product_id: int, count: int = 1) -> None:
+        if self.has_room(self.views, product_id):
+            self.views[product_id] += count
+        self.check_overflow()
+
+    def touch(self, tenant: str, tg_id: int, seen_at: dt.datetime | None = None) -> None:
+        key = (tenant, tg_id)
+        seen_at = seen_at or dt.datetime.utcnow()
+        if self.has_room(self.last_seen, key):
+            self.last_seen[key] = max(seen_at, self.last_seen.get(key, seen_at))
+        self.check_overflow()
+
+    def check_overflow(self) -> None:
+        if self.pending() >= self.max_pending:
+            self.overflow.set()
+
+    async def flush(self) -> None:
+        async with self.lock:
+            views, self.views = self.views, Counter()
+            last_seen, self.last_seen = self.last_seen, {}
+            if not views and not last_seen:
+                return
+            try:
+                async with SessionLocal() as session:
+                    for chunk in chunks(sorted(views.items())):
+                        await session.execute(upsert_views(chunk))
+                    for chunk in chunks(list(last_seen.items())):
+                        await session.execute(update_last_seen(chunk))
+                    await session.commit()
+            except BaseException:
+                # Возвращаем несохранённое в буфер (в пределах max_buffer), попробуем в следующий раз.
+                # BaseException — чтобы не потерять данные и при отмене задачи на остановке бота.
+                for product_id, count in views.items():
+                    self.record_view(product_id, count)
+                for (tenant, tg_id), seen_at in last_seen.items():
+                    self.touch(tenant, tg_id, seen_at)
+                raise
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self.overflow.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.overflow.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception(
+                    "Не удалось сбросить буфер активности, в буфере %s, отброшено всего %s",
+                    self.pending(),
+                    self.dropped,
+                )
+                # Пауза перед следующей попыткой: иначе при лежащей БД переполненный буфер
+                # выставлял бы overflow на каждом апдейте и flush шёл бы без остановки.
+                await asyncio.sleep(self.flush_interval)
+
+
+# Строк на один многострочный запрос: держимся ниже лимита в 32767 параметров.
+FLUSH_CHUNK_SIZE = 5000
+
+
+def chunks(items: list) -> Iterator[list]:
+    for start in range(0, len(items), FLUSH_CHUNK_SIZE):
+        yield items[start:start + FLUSH_CHUNK_SIZE]
+
+
+def upsert_views(views: List[Tuple[int, int]]):
+    stmt = insert(ProductStats).values(
+        [{"product_id": product_id, "views": count} for product_id, count in views]
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[ProductStats.product_id],
+        set_={"views": ProductStats.views + stmt.excluded.views},
+    )
+
+
+def update_last_seen(last_seen: List[Tuple[Tuple[str, int], dt.datetime]]):
+    seen = values(
+        column("tenant", String),
+        column("tg_id", BigInteger),
+        column("seen_at", DateTime),
+        name="seen",
+    ).data([(tenant, tg_id, seen_at) for (tenant, tg_id), seen_at in last_seen])
+    return (
+        update(User)
+        .where(User.tenant == seen.c.tenant, User.tg_id == seen.c.tg_id)
+        .values(last_seen_at=seen.c.seen_at)
+        .execution_options(synchronize_session=False)
+    )
+
+
+activity = ActivityBuffer(ACTIVITY_FLUSH_INTERVAL, ACTIVITY_MAX_PENDING, ACTIVITY_MAX_BUFFER)
@@ -1,30 +1,95 @@
 import asyncio
+import time
 
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 
-from app.config import BOT_TOKEN
+from app.config import BOTS, TELEGRAM_API_URL, HEALTH_PORT
 from app.logger import logger
 from app.db.session import init_db
+from app.db.maintenance import maintenance_loop
+from app.db.reservations import reservation_sweeper
+from app.activity import activity
+from app.health import health, start_health_server
+from app.startup import startup_phase, warm_pool, warm_up
+from app.fsm_storage import TTLMemoryStorage, fsm_sweeper
+from app.middlewares.activity import ActivityMiddleware
+from app.middlewares.fsm_expiry import FSMExpiryMiddleware
+from app.middlewares.tenant import TenantMiddleware
 from app.handlers import user as user_handlers
 from app.handlers import admin as admin_handlers
 
 
 async def main():
-    await init_db()
+    # /healthz отвечает сразу, /readyz — только когда бот прогрет и начал поллинг.
+    health_runner = await start_health_server() if HEALTH_PORT else None
 
-    bot = Bot(
-        token=BOT_TOKEN,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
-    )
-    dp = Dispatcher()
+    if TELEGRAM_API_URL:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL))
+    else:
+        session = AiohttpSession()
+
+    # Все витрины делят одну HTTP-сессию, один Dispatcher и один пул соединений с БД.
+    bots = [
+        Bot(
+            token=config.token,
+            session=session,
+            default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+        )
+        for config in BOTS
+    ]
+
+    # Независимые шаги идут параллельно: соединения с БД и Bot API открываются одновременно,
+    # прогрев каталога и пользователей — после проверки схемы.
+    with startup_phase("connect"):
+        await asyncio.gather(warm_pool(), *(bot.me() for bot in bots))
+    with startup_phase("schema"):
+        if await init_db():
+            logger.info("Схема БД создана или обновлена")
+    with startup_phase("warmup"):
+        await warm_up([config.tenant for config in BOTS])
+
+    storage = TTLMemoryStorage()
+    dp = Dispatcher(storage=storage)
+    dp.update.outer_middleware(TenantMiddleware({bot.id: config for bot, config in zip(bots, BOTS)}))
+    dp.update.outer_middleware(ActivityMiddleware())
+    dp.message.outer_middleware(FSMExpiryMiddleware(storage))
 
     dp.include_router(user_handlers.router)
     dp.include_router(admin_handlers.router)
 
-    logger.info("Бот запущен")
-    await dp.start_polling(bot)
+    @dp.startup()
+    async def on_startup():
+        health.ready = True
+        logger.info("Бот готов за %.3f с", time.monotonic() - health.started)
+
+    @dp.shutdown()
+    async def on_shutdown():
+        health.ready = False
+
+    background_tasks = [
+        asyncio.create_task(maintenance_loop()),
+        asyncio.create_task(reservation_sweeper()),
+        asyncio.create_task(fsm_sweeper(storage)),
+        asyncio.create_task(activity.run()),
+    ]
+
+    logger.info("Бот запущен, витрин: %s", len(bots))
+    try:
+        await dp.start_polling(*bots)
+    finally:
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        try:
+            await activity.flush()
+        except Exception:
+            logger.exception("Не удалось сохранить буфер активности при остановке")
+        if health_runner:
+            await health_runner.cleanup()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,136 @@
+import csv
+import io
+import itertools
+import json
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterator, List, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import BULK_UPLOAD_MAX_ROWS, BULK_UPLOAD_BATCH_SIZE
+from app.db.models import Product, ProductCategory, ProductStatus, CATEGORY_TITLES, MAX_PRICE, MAX_QUANTITY
+
+
+MAX_ERRORS_IN_REPORT = 20
+
+_categories = {category.value: category for category in ProductCategory}
+_categories.update({title.lower(): category for category, title in CATEGORY_TITLES.items()})
+
+
+@dataclass
+class ImportResult:
+    accepted: int = 0
+    rejected: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def reject(self, line_no: int, reason: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < MAX_ERRORS_IN_REPORT:
+            self.errors.append(f"строка {line_no}: {reason}")
+
+
+def iter_csv_rows(stream: BinaryIO) -> Iterator[Tuple[int, dict]]:
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig"))
+    for line_no, row in enumerate(reader, start=2):
+        yield line_no, row
+
+
+def iter_json_rows(stream: BinaryIO) -> Iterator[Tuple[int, dict]]:
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig")
+    head = text.read(1)
+    while head and head.isspace():
+        head = text.read(1)
+
+    if head == "[":
+        # Обычный JSON-массив читается целиком (Bot API отдаёт файлы до 20 МБ),
+        # JSON Lines — построчно, не держа весь документ в памяти.
+        for index, row in enumerate(json.loads(head + text.read()), start=1):
+            yield index, row
+        return
+
+    for line_no, line in enumerate(itertools.chain([head + text.readline()], text), start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except json.JSONDecodeError as e:
+            # Битая строка отклоняется сама по себе, остальной файл разбирается дальше.
+            yield line_no, ValueError(f"некорректный JSON: {e.msg}")
+
+
+def validate_row(row) -> dict:
+    if isinstance(row, ValueError):
+        raise row
+    if not isinstance(row, dict):
+        raise ValueError("ожидался объект с полями title, description, price")
+
+    title = str(row.get("title") or "").strip()
+    if not title:
+        raise ValueError("пустое название")
+    if len(title) > 255:
+        raise ValueError("название длиннее 255 символов")
+
+    description = str(row.get("description") or "").strip()
+    if not description:
+        raise ValueError("пустое описание")
+
+    price = str(row.get("price") or "").strip()
+    if not price.isdigit() or int(price) <= 0:
+        raise ValueError("цена должна быть целым положительным числом в рублях")
+    if int(price) * 100 > MAX_PRICE:
+        raise ValueError(f"цена больше {MAX_PRICE // 100} ₽")
+
+    raw_quantity = row.get("quantity")
+    raw_quantity = "1" if raw_quantity is None or raw_quantity == "" else str(raw_quantity).strip()
+    if not raw_quantity.isdigit() or int(raw_quantity) <= 0:
+        raise ValueError("количество должно быть целым положительным числом")
+    if int(raw_quantity) > MAX_QUANTITY:
+        raise ValueError(f"количество больше {MAX_QUANTITY}")
+
+    raw_category = str(row.get("category") or "").strip().lower()
+    category = _categories.get(raw_category) if raw_category else ProductCategory.OTHER
+    if not category:
+        raise ValueError(f"неизвестная категория {raw_category!r}")
+
+    return {
+        "title": title,
+        "description": description,
+        "price": int(price) * 100,
+        "quantity": int(raw_quantity),
+        "category": category,
+    }
+
+
+async def import_products(
+    session: AsyncSession,
+    tenant: str,
+    user_id: int,
+    rows: Iterator[Tuple[int, dict]],
+) -> ImportResult:
+    result = ImportResult()
+    batch = []
+    try:
+        for line_no, row in rows:
+            if result.accepted + len(batch) >= BULK_UPLOAD_MAX_ROWS:
+                result.reject(line_no, f"превышен лимит в {BULK_UPLOAD_MAX_ROWS} строк")
+                continue
+            try:
+                values = validate_row(row)
+            except ValueError as e:
+                result.reject(line_no, str(e))
+                continue
+            batch.append({**values, "tenant": tenant, "user_id": user_id, "status": ProductStatus.PENDING})
+            if len(batch) >= BULK_UPLOAD_BATCH_SIZE:
+                await session.execute(insert(Product), batch)
+                result.accepted += len(batch)
+                batch = []
+    except (UnicodeDecodeError, csv.Error, json.JSONDecodeError) as e:
+        result.rejected += 1
+        result.errors.append(f"файл не удалось разобрать дальше: {e}")
+
+    if batch:
+        await session.execute(insert(Product), batch)
+        result.accepted += len(batch)
+    await session.commit()
+    return result
@@ -1,4 +1,6 @@
+import json
 import os
+from dataclasses import dataclass
 from typing import List
 
 from dotenv import load_dotenv
@@ -6,9 +8,15 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
-BOT_TOKEN = os.getenv("BOT_TOKEN")
-if not BOT_TOKEN:
-    raise RuntimeError("BOT_TOKEN не задан")
+@dataclass(frozen=True)
+class BotConfig:
+    tenant: str
+    token: str
+    payment_provider_token: str
+    admin_ids: List[int]
+
+
+DEFAULT_TENANT = "default"
 
 
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -24,8 +32,97 @@ if not DATABASE_URL:
     )
 
 
-PAYMENT_PROVIDER_TOKEN = os.getenv("PAYMENT_PROVIDER_TOKEN", "")
+# Несколько витрин в одном процессе: BOTS_CONFIG — JSON-список вида
+# [{"tenant": "shop1", "token": "...", "payment_provider_token": "...", "admin_ids": [1, 2]}, ...].
+# Без него работает один бот из BOT_TOKEN / PAYMENT_PROVIDER_TOKEN / ADMIN_IDS.
+raw_bots = os.getenv("BOTS_CONFIG", "")
+if raw_bots:
+    BOTS: List[BotConfig] = [
+        BotConfig(
+            tenant=str(item["tenant"]),
+            token=item["token"],
+            payment_provider_token=item.get("payment_provider_token", ""),
+            admin_ids=[int(x) for x in item.get("admin_ids", [])],
+        )
+        for item in json.loads(raw_bots)
+    ]
+else:
+    BOT_TOKEN = os.getenv("BOT_TOKEN")
+    if not BOT_TOKEN:
+        raise RuntimeError("BOT_TOKEN не задан")
+    raw_admins = os.getenv("ADMIN_IDS", "")
+    BOTS = [
+        BotConfig(
+            tenant=DEFAULT_TENANT,
+            token=BOT_TOKEN,
+            payment_provider_token=os.getenv("PAYMENT_PROVIDER_TOKEN", ""),
+            admin_ids=[int(x) for x in raw_admins.split(",") if x.strip().isdigit()],
+        )
+    ]
+
+if not BOTS:
+    raise RuntimeError("BOTS_CONFIG пуст")
+if len({bot.tenant for bot in BOTS}) != len(BOTS):
+    raise RuntimeError("В BOTS_CONFIG повторяются tenant")
+
+
+# Базовый URL Bot API, например локальный telegram-bot-api или фейковый сервер из soak/.
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+
+
+# Обслуживание БД: партиции purchases/withdrawal_requests и перенос старых строк в архив.
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+MAINTENANCE_INTERVAL = int(os.getenv("MAINTENANCE_INTERVAL", "3600"))
+
+
+BULK_UPLOAD_MAX_ROWS = int(os.getenv("BULK_UPLOAD_MAX_ROWS", "10000"))
+BULK_UPLOAD_BATCH_SIZE = int(os.getenv("BULK_UPLOAD_BATCH_SIZE", "1000"))
+
+
+# Бронь единицы товара на время оплаты инвойса.
+RESERVATION_TTL = int(os.getenv("RESERVATION_TTL", "900"))
+# После pre_checkout бронь продлевается на это время, чтобы её не сняли, пока проходит оплата.
+RESERVATION_PAYMENT_GRACE = int(os.getenv("RESERVATION_PAYMENT_GRACE", "300"))
+RESERVATION_SWEEP_INTERVAL = int(os.getenv("RESERVATION_SWEEP_INTERVAL", "60"))
+RESERVATION_SWEEP_BATCH_SIZE = int(os.getenv("RESERVATION_SWEEP_BATCH_SIZE", "500"))
+
+
+# Кэш ссылок на инвойсы (create_invoice_link) на версию карточки вместо answer_invoice на каждое нажатие.
+INVOICE_LINK_CACHE = os.getenv("INVOICE_LINK_CACHE", "").lower() in ("1", "true", "yes")
+INVOICE_LINK_CACHE_SIZE = int(os.getenv("INVOICE_LINK_CACHE_SIZE", "5000"))
+
+
+# Время жизни незаконченных FSM-сценариев (в секундах) и лимит хранимых контекстов.
+FSM_STATE_TTL = {
+    "AddCardState": int(os.getenv("FSM_TTL_ADD_CARD", "1800")),
+    "BulkUploadState": int(os.getenv("FSM_TTL_BULK_UPLOAD", "1800")),
+    "EditCardState": int(os.getenv("FSM_TTL_EDIT_CARD", "900")),
+    "WithdrawState": int(os.getenv("FSM_TTL_WITHDRAW", "600")),
+}
+FSM_DEFAULT_TTL = int(os.getenv("FSM_DEFAULT_TTL", "3600"))
+FSM_MAX_CONTEXTS = int(os.getenv("FSM_MAX_CONTEXTS", "50000"))
+FSM_SWEEP_INTERVAL = int(os.getenv("FSM_SWEEP_INTERVAL", "60"))
+
+
+# Сколько строк на странице «Мои покупки» / «Мои карточки».
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "10"))
+
+
+# Буфер просмотров карточек и последней активности пользователей: сбрасывается в БД
+# раз в ACTIVITY_FLUSH_INTERVAL секунд или при накоплении ACTIVITY_MAX_PENDING записей.
+ACTIVITY_FLUSH_INTERVAL = int(os.getenv("ACTIVITY_FLUSH_INTERVAL", "30"))
+ACTIVITY_MAX_PENDING = int(os.getenv("ACTIVITY_MAX_PENDING", "5000"))
+# Жёсткий предел буфера, пока БД недоступна: новые ключи сверх него отбрасываются.
+ACTIVITY_MAX_BUFFER = int(os.getenv("ACTIVITY_MAX_BUFFER", "50000"))
+CATALOG_POPULAR_SORT = os.getenv("CATALOG_POPULAR_SORT", "").lower() in ("1", "true", "yes")
 
 
-raw_admins = os.getenv("ADMIN_IDS", "")
-ADMIN_IDS: List[int] = [int(x) for x in raw_admins.split(",") if x.strip().isdigit()]
+# HTTP-пробы для оркестратора: /healthz — процесс жив, /readyz — бот прогрет и принимает апдейты.
+# HEALTH_PORT=0 отключает сервер.
+HEALTH_HOST = os.getenv("HEALTH_HOST", "0.0.0.0")
+HEALTH_PORT = int(os.getenv("HEALTH_PORT", "8080"))
+# Сколько id карточек и недавно активных пользователей на витрину прочитать при старте, чтобы прогреть кэш БД.
+STARTUP_WARM_PRODUCTS = int(os.getenv("STARTUP_WARM_PRODUCTS", "10000"))
+STARTUP_WARM_USERS = int(os.getenv("STARTUP_WARM_USERS", "5000"))
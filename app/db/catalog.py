@@ -0,0 +1,101 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from sqlalchemy import select, tuple_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import CATALOG_POPULAR_SORT
+from app.db.models import Product, ProductCategory, ProductStats, ProductStatus
+
+
+# (подпись, нижняя граница включительно, верхняя граница не включительно), цены в копейках.
+PRICE_RANGES = [
+    ("Любая цена", None, None),
+    ("до 500 ₽", None, 500_00),
+    ("500–2000 ₽", 500_00, 2000_00),
+    ("2000–10000 ₽", 2000_00, 10000_00),
+    ("от 10000 ₽", 10000_00, None),
+]
+
+SORT_TITLES = {
+    "new": "Сначала новые",
+    "cheap": "Сначала дешёвые",
+}
+if CATALOG_POPULAR_SORT:
+    SORT_TITLES["pop"] = "Популярные"
+
+
+@dataclass(frozen=True)
+class CatalogFilter:
+    category: Optional[ProductCategory] = None
+    price_range: int = 0
+    sort: str = "new"
+
+    def pack(self) -> str:
+        category = self.category.value if self.category else "*"
+        return f"{category}.{self.price_range}.{self.sort}"
+
+    @classmethod
+    def unpack(cls, raw: str) -> "CatalogFilter":
+        try:
+            category, price_range, sort = raw.split(".")
+            price_range = int(price_range)
+            return cls(
+                category=None if category == "*" else ProductCategory(category),
+                price_range=price_range if 0 <= price_range < len(PRICE_RANGES) else 0,
+                sort=sort if sort in SORT_TITLES else "new",
+            )
+        except ValueError:
+            return cls()
+
+
+# (ключ сортировки, id) карточки, на которой стоит пользователь: цена для "cheap",
+# число просмотров для "pop"; для сортировки "new" важен только id.
+Cursor = Tuple[int, int]
+
+
+async def get_catalog_product(
+    session: AsyncSession,
+    tenant: str,
+    flt: CatalogFilter,
+    cursor: Optional[Cursor] = None,
+    direction: str = "next",
+) -> Tuple[Optional[Product], int]:
+    stmt = select(Product).where(
+        Product.tenant == tenant,
+        Product.status == ProductStatus.APPROVED,
+        Product.quantity > 0,
+    )
+    if flt.category:
+        stmt = stmt.where(Product.category == flt.category)
+    _, price_min, price_max = PRICE_RANGES[flt.price_range]
+    if price_min is not None:
+        stmt = stmt.where(Product.price >= price_min)
+    if price_max is not None:
+        stmt = stmt.where(Product.price < price_max)
+
+    forward = direction == "next"
+    if flt.sort == "cheap":
+        key = tuple_(Product.price, Product.id)
+        if cursor:
+            stmt = stmt.where(key > tuple_(*cursor) if forward else key < tuple_(*cursor))
+        order = [Product.price.asc(), Product.id.asc()] if forward else [Product.price.desc(), Product.id.desc()]
+    elif flt.sort == "pop":
+        # Просмотры живут в product_stats и растут между нажатиями, поэтому порядок
+        # здесь приблизительный и индексом по products не покрывается.
+        views = func.coalesce(ProductStats.views, 0)
+        stmt = stmt.add_columns(views).outerjoin(ProductStats)
+        key = tuple_(views, Product.id)
+        if cursor:
+            stmt = stmt.where(key < tuple_(*cursor) if forward else key > tuple_(*cursor))
+        order = [views.desc(), Product.id.desc()] if forward else [views.asc(), Product.id.asc()]
+    else:
+        if cursor:
+            stmt = stmt.where(Product.id < cursor[1] if forward else Product.id > cursor[1])
+        order = [Product.id.desc()] if forward else [Product.id.asc()]
+
+    q = await session.execute(stmt.order_by(*order).limit(1))
+    row = q.first()
+    if not row:
+        return None, 0
+    return row[0], row[1] if flt.sort == "pop" else row[0].price
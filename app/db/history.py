@@ -0,0 +1,58 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, func
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import HISTORY_PAGE_SIZE
+from app.db.models import Product, Purchase
+
+
+# Страницы «Мои покупки» / «Мои карточки»: keyset по id от самых новых.
+# direction "next" — строки старше before_id, "prev" — новее after_id.
+async def fetch_page(session: AsyncSession, stmt, key, cursor: Optional[int], direction: str) -> Tuple[List[Row], bool]:
+    if direction == "next":
+        if cursor:
+            stmt = stmt.where(key < cursor)
+        stmt = stmt.order_by(key.desc())
+    else:
+        stmt = stmt.where(key > cursor).order_by(key.asc())
+    q = await session.execute(stmt.limit(HISTORY_PAGE_SIZE + 1))
+    rows = q.all()
+    has_more = len(rows) > HISTORY_PAGE_SIZE
+    rows = rows[:HISTORY_PAGE_SIZE]
+    if direction == "prev":
+        rows.reverse()
+    return rows, has_more
+
+
+async def get_purchases_page(
+    session: AsyncSession, buyer_id: int, cursor: Optional[int] = None, direction: str = "next"
+) -> Tuple[List[Row], bool]:
+    stmt = (
+        select(Purchase.id, Purchase.amount, Purchase.created_at, Product.title)
+        .join(Product, Product.id == Purchase.product_id)
+        .where(Purchase.buyer_id == buyer_id)
+    )
+    return await fetch_page(session, stmt, Purchase.id, cursor, direction)
+
+
+async def get_seller_products_page(
+    session: AsyncSession, user_id: int, cursor: Optional[int] = None, direction: str = "next"
+) -> Tuple[List[Row], bool]:
+    stmt = select(Product.id, Product.title, Product.status, Product.price, Product.quantity).where(
+        Product.user_id == user_id
+    )
+    return await fetch_page(session, stmt, Product.id, cursor, direction)
+
+
+async def get_sales_counts(session: AsyncSession, product_ids: Sequence[int]) -> Dict[int, int]:
+    # Один сгруппированный запрос на всю страницу вместо запроса на каждую карточку.
+    if not product_ids:
+        return {}
+    q = await session.execute(
+        select(Purchase.product_id, func.count())
+        .where(Purchase.product_id.in_(product_ids))
+        .group_by(Purchase.product_id)
+    )
+    return dict(q.all())
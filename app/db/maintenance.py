@@ -0,0 +1,136 @@
+import asyncio
+import datetime as dt
+
+from sqlalchemy import select, insert, delete, exists
+
+from app.config import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, MAINTENANCE_INTERVAL
+from app.logger import logger
+from app.db.session import SessionLocal, engine
+from app.db.partitions import ensure_partitions
+from app.db.models import (
+    Product,
+    ProductArchive,
+    ProductStatus,
+    Purchase,
+    Reservation,
+    ReservationStatus,
+    WithdrawalRequest,
+    WithdrawalRequestArchive,
+    WithdrawalStatus,
+)
+
+
+async def archive_batch(session, model, archive_model, conditions, dependents=()) -> int:
+    q = await session.execute(
+        select(model.id)
+        .where(*conditions)
+        .order_by(model.id.asc())
+        .limit(ARCHIVE_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+    )
+    ids = q.scalars().all()
+    if not ids:
+        return 0
+
+    columns = [column.name for column in model.__table__.columns]
+    await session.execute(
+        insert(archive_model).from_select(
+            columns,
+            select(*[model.__table__.c[name] for name in columns]).where(model.id.in_(ids)),
+        )
+    )
+    # Служебные строки, ссылающиеся на архивируемые, удаляются вместе с ними.
+    for foreign_key in dependents:
+        await session.execute(
+            delete(foreign_key.class_).where(foreign_key.in_(ids)).execution_options(synchronize_session=False)
+        )
+    await session.execute(
+        delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    return len(ids)
+
+
+async def purge_finished_reservations(cutoff: dt.datetime) -> int:
+    # Снятые и подтверждённые брони больше не нужны: продажа записана в purchases.
+    total = 0
+    async with SessionLocal() as session:
+        while True:
+            stale = (
+                select(Reservation.id)
+                .where(
+                    Reservation.status.in_([ReservationStatus.RELEASED, ReservationStatus.CONFIRMED]),
+                    Reservation.created_at < cutoff,
+                )
+                .order_by(Reservation.id.asc())
+                .limit(ARCHIVE_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            q = await session.execute(
+                delete(Reservation)
+                .where(Reservation.id.in_(stale.scalar_subquery()))
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+            total += q.rowcount
+            if q.rowcount < ARCHIVE_BATCH_SIZE:
+                return total
+
+
+async def archive_stale_rows() -> None:
+    cutoff = dt.datetime.utcnow() - dt.timedelta(days=ARCHIVE_AFTER_DAYS)
+    purged = await purge_finished_reservations(cutoff)
+    if purged:
+        logger.info("Удалено завершённых броней: %s", purged)
+
+    jobs = [
+        (
+            Product,
+            ProductArchive,
+            [
+                Product.status == ProductStatus.REJECTED,
+                Product.updated_at < cutoff,
+                ~exists().where(Purchase.product_id == Product.id),
+                ~exists().where(
+                    Reservation.product_id == Product.id,
+                    Reservation.status == ReservationStatus.ACTIVE,
+                ),
+            ],
+            [Reservation.product_id],
+        ),
+        (
+            WithdrawalRequest,
+            WithdrawalRequestArchive,
+            [
+                WithdrawalRequest.status == WithdrawalStatus.PAID,
+                WithdrawalRequest.paid_at < cutoff,
+            ],
+            [],
+        ),
+    ]
+
+    for model, archive_model, conditions, dependents in jobs:
+        total = 0
+        async with SessionLocal() as session:
+            while True:
+                moved = await archive_batch(session, model, archive_model, conditions, dependents)
+                total += moved
+                if moved < ARCHIVE_BATCH_SIZE:
+                    break
+        if total:
+            logger.info("В архив перенесено %s строк из %s", total, model.__tablename__)
+
+
+async def maintenance_loop() -> None:
+    while True:
+        # Шаги независимы: ошибка с партициями не должна останавливать архивацию.
+        try:
+            async with engine.begin() as conn:
+                await ensure_partitions(conn)
+        except Exception:
+            logger.exception("Ошибка при создании партиций")
+        try:
+            await archive_stale_rows()
+        except Exception:
+            logger.exception("Ошибка при архивации")
+        await asyncio.sleep(MAINTENANCE_INTERVAL)
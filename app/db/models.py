@@ -2,47 +2,109 @@ import enum
 import datetime as dt
 from typing import Optional, List
 
-from sqlalchemy import ForeignKey, Enum, Text, String, BigInteger, Integer
+from sqlalchemy import and_, ForeignKey, Enum, Text, String, BigInteger, Integer, Index, UniqueConstraint
 from sqlalchemy.orm import mapped_column, Mapped, relationship
 
+from app.config import DEFAULT_TENANT
 from app.db.base import Base
 
 
+# Увеличивать при любом изменении моделей: при совпадении с версией в БД старт пропускает create_all.
+# Изменения уже существующих таблиц описываются шагом в app/db/upgrade.py.
+SCHEMA_VERSION = 14
+
+
 class ProductStatus(enum.Enum):
     PENDING = "pending"
     APPROVED = "approved"
     REJECTED = "rejected"
 
 
+STATUS_TITLES = {
+    ProductStatus.PENDING: "на модерации",
+    ProductStatus.APPROVED: "одобрена",
+    ProductStatus.REJECTED: "отклонена",
+}
+
+
+# Цена (в копейках) и остаток хранятся в 32-битном Integer.
+MAX_PRICE = 2**31 - 1
+MAX_QUANTITY = 1_000_000
+
+
+class ProductCategory(enum.Enum):
+    ELECTRONICS = "electronics"
+    CLOTHES = "clothes"
+    HOME = "home"
+    HOBBY = "hobby"
+    SERVICES = "services"
+    OTHER = "other"
+
+
+CATEGORY_TITLES = {
+    ProductCategory.ELECTRONICS: "Электроника",
+    ProductCategory.CLOTHES: "Одежда",
+    ProductCategory.HOME: "Дом",
+    ProductCategory.HOBBY: "Хобби",
+    ProductCategory.SERVICES: "Услуги",
+    ProductCategory.OTHER: "Другое",
+}
+
+
 class WithdrawalStatus(enum.Enum):
     PENDING = "pending"
     PAID = "paid"
 
 
+class ReservationStatus(enum.Enum):
+    ACTIVE = "active"
+    CONFIRMED = "confirmed"
+    RELEASED = "released"
+
+
 class User(Base):
     __tablename__ = "users"
+    # Один Telegram-пользователь в разных витринах — разные строки.
+    __table_args__ = (UniqueConstraint("tenant", "tg_id", name="users_tenant_tg_id_key"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    tg_id: Mapped[int] = mapped_column(BigInteger, unique=True, index=True)
+    tenant: Mapped[str] = mapped_column(String(32), default=DEFAULT_TENANT)
+    tg_id: Mapped[int] = mapped_column(BigInteger)
     username: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
     is_admin: Mapped[bool] = mapped_column(default=False)
     balance: Mapped[int] = mapped_column(Integer, default=0)
     created_at: Mapped[dt.datetime] = mapped_column(default=dt.datetime.utcnow)
+    last_seen_at: Mapped[Optional[dt.datetime]] = mapped_column(nullable=True)
 
     products: Mapped[List["Product"]] = relationship(back_populates="user")
     withdrawals: Mapped[List["WithdrawalRequest"]] = relationship(back_populates="user")
     purchases: Mapped[List["Purchase"]] = relationship(back_populates="buyer")
 
 
+# Прогрев при старте читает недавно активных пользователей витрины: без индекса это полный scan и сортировка.
+Index(
+    "ix_users_tenant_last_seen_at",
+    User.tenant,
+    User.last_seen_at,
+    postgresql_where=User.last_seen_at.isnot(None),
+)
+
+
 class Product(Base):
     __tablename__ = "products"
 
     id: Mapped[int] = mapped_column(primary_key=True)
+    tenant: Mapped[str] = mapped_column(String(32), default=DEFAULT_TENANT)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     title: Mapped[str] = mapped_column(String(255))
     description: Mapped[str] = mapped_column(Text)
     price: Mapped[int] = mapped_column(Integer)
+    quantity: Mapped[int] = mapped_column(Integer, default=1)
     photo_file_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    category: Mapped[ProductCategory] = mapped_column(
+        Enum(ProductCategory),
+        default=ProductCategory.OTHER,
+    )
     status: Mapped[ProductStatus] = mapped_column(
         Enum(ProductStatus),
         default=ProductStatus.PENDING,
@@ -57,24 +119,99 @@ class Product(Base):
     purchases: Mapped[List["Purchase"]] = relationship(back_populates="product")
 
 
+# Частичные индексы под каталог: каждая страница — range scan по (витрина, категория?, ключ сортировки, id).
+# Распроданные карточки остаются одобренными, поэтому в условии и остаток: иначе листание шло бы по мёртвым записям.
+_in_catalog = and_(Product.status == ProductStatus.APPROVED, Product.quantity > 0)
+Index("ix_products_catalog_new", Product.tenant, Product.id, postgresql_where=_in_catalog)
+Index("ix_products_catalog_cheap", Product.tenant, Product.price, Product.id, postgresql_where=_in_catalog)
+Index(
+    "ix_products_catalog_category_new",
+    Product.tenant,
+    Product.category,
+    Product.id,
+    postgresql_where=_in_catalog,
+)
+Index(
+    "ix_products_catalog_category_cheap",
+    Product.tenant,
+    Product.category,
+    Product.price,
+    Product.id,
+    postgresql_where=_in_catalog,
+)
+Index("ix_products_tenant_status_id", Product.tenant, Product.status, Product.id)
+# «Мои карточки»: страница продавца читается index-only scan'ом, без обращения к строкам products.
+Index(
+    "ix_products_user_id_id",
+    Product.user_id,
+    Product.id,
+    postgresql_include=["title", "status", "price", "quantity"],
+)
+
+
+# Счётчики просмотров вынесены из products, чтобы запись статистики не трогала
+# горячие строки каталога и их updated_at.
+class ProductStats(Base):
+    __tablename__ = "product_stats"
+
+    product_id: Mapped[int] = mapped_column(
+        ForeignKey("products.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    views: Mapped[int] = mapped_column(BigInteger, default=0)
+
+
+class Reservation(Base):
+    __tablename__ = "reservations"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"), index=True)
+    buyer_tg_id: Mapped[int] = mapped_column(BigInteger)
+    status: Mapped[ReservationStatus] = mapped_column(
+        Enum(ReservationStatus),
+        default=ReservationStatus.ACTIVE,
+    )
+    expires_at: Mapped[dt.datetime]
+    created_at: Mapped[dt.datetime] = mapped_column(default=dt.datetime.utcnow)
+
+
+Index(
+    "ix_reservations_active_expires_at",
+    Reservation.expires_at,
+    postgresql_where=Reservation.status == ReservationStatus.ACTIVE,
+)
+
+
 class Purchase(Base):
     __tablename__ = "purchases"
+    # Помесячные партиции по created_at, ключ партиционирования обязан входить в PK.
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
 
-    id: Mapped[int] = mapped_column(primary_key=True)
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     buyer_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
-    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"))
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"), index=True)
     amount: Mapped[int] = mapped_column(Integer)
     payload: Mapped[str] = mapped_column(String(255))
-    created_at: Mapped[dt.datetime] = mapped_column(default=dt.datetime.utcnow)
+    created_at: Mapped[dt.datetime] = mapped_column(primary_key=True, default=dt.datetime.utcnow)
 
     buyer: Mapped["User"] = relationship(back_populates="purchases")
     product: Mapped["Product"] = relationship(back_populates="purchases")
 
 
+# «Мои покупки»: keyset по (buyer_id, id), остальные поля страницы лежат в самом индексе.
+Index(
+    "ix_purchases_buyer_id_id",
+    Purchase.buyer_id,
+    Purchase.id,
+    postgresql_include=["product_id", "amount", "created_at"],
+)
+
+
 class WithdrawalRequest(Base):
     __tablename__ = "withdrawal_requests"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
 
-    id: Mapped[int] = mapped_column(primary_key=True)
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     amount: Mapped[int] = mapped_column(Integer)
     details: Mapped[str] = mapped_column(Text)
@@ -82,7 +219,48 @@ class WithdrawalRequest(Base):
         Enum(WithdrawalStatus),
         default=WithdrawalStatus.PENDING,
     )
-    created_at: Mapped[dt.datetime] = mapped_column(default=dt.datetime.utcnow)
+    created_at: Mapped[dt.datetime] = mapped_column(primary_key=True, default=dt.datetime.utcnow)
     paid_at: Mapped[Optional[dt.datetime]] = mapped_column(nullable=True)
 
     user: Mapped["User"] = relationship(back_populates="withdrawals")
+
+
+# Архивные таблицы: сюда retention-задача переносит старые отклонённые карточки
+# и выплаченные заявки, чтобы горячие таблицы и их индексы оставались маленькими.
+class ProductArchive(Base):
+    __tablename__ = "products_archive"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    tenant: Mapped[str] = mapped_column(String(32))
+    user_id: Mapped[int] = mapped_column(Integer, index=True)
+    title: Mapped[str] = mapped_column(String(255))
+    description: Mapped[str] = mapped_column(Text)
+    price: Mapped[int] = mapped_column(Integer)
+    quantity: Mapped[int] = mapped_column(Integer)
+    photo_file_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    category: Mapped[ProductCategory] = mapped_column(Enum(ProductCategory))
+    status: Mapped[ProductStatus] = mapped_column(Enum(ProductStatus))
+    created_at: Mapped[dt.datetime]
+    updated_at: Mapped[dt.datetime]
+    archived_at: Mapped[dt.datetime] = mapped_column(default=dt.datetime.utcnow)
+
+
+class WithdrawalRequestArchive(Base):
+    __tablename__ = "withdrawal_requests_archive"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    user_id: Mapped[int] = mapped_column(Integer, index=True)
+    amount: Mapped[int] = mapped_column(Integer)
+    details: Mapped[str] = mapped_column(Text)
+    status: Mapped[WithdrawalStatus] = mapped_column(Enum(WithdrawalStatus))
+    created_at: Mapped[dt.datetime]
+    paid_at: Mapped[Optional[dt.datetime]] = mapped_column(nullable=True)
+    archived_at: Mapped[dt.datetime] = mapped_column(default=dt.datetime.utcnow)
+
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    version: Mapped[int] = mapped_column(Integer)
+    applied_at: Mapped[dt.datetime] = mapped_column(default=dt.datetime.utcnow)
@@ -0,0 +1,46 @@
+import datetime as dt
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import PARTITION_MONTHS_AHEAD
+from app.logger import logger
+
+
+PARTITIONED_TABLES = ("purchases", "withdrawal_requests")
+
+
+def next_month(day: dt.date) -> dt.date:
+    return (day.replace(day=28) + dt.timedelta(days=4)).replace(day=1)
+
+
+async def create_month_partition(conn: AsyncConnection, table: str, month: dt.date) -> None:
+    partition = f"{table}_{month:%Y_%m}"
+    if await conn.scalar(text(f"SELECT to_regclass('{partition}')")) is not None:
+        return
+    lower, upper = month.isoformat(), next_month(month).isoformat()
+    bounds = f"created_at >= '{lower}' AND created_at < '{upper}'"
+    create = f"CREATE TABLE {partition} PARTITION OF {table} FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    if not await conn.scalar(text(f"SELECT EXISTS (SELECT 1 FROM {table}_default WHERE {bounds})")):
+        await conn.execute(text(create))
+        return
+
+    # Строки месяца уже попали в DEFAULT-партицию, и Postgres не даст создать партицию поверх них:
+    # отцепляем DEFAULT, создаём месяц, переносим строки и цепляем DEFAULT обратно.
+    await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {table}_default"))
+    await conn.execute(text(create))
+    q = await conn.execute(text(f"INSERT INTO {partition} SELECT * FROM {table}_default WHERE {bounds}"))
+    await conn.execute(text(f"DELETE FROM {table}_default WHERE {bounds}"))
+    await conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {table}_default DEFAULT"))
+    logger.warning("Из %s_default в %s перенесено строк: %s", table, partition, q.rowcount)
+
+
+async def ensure_partitions(conn: AsyncConnection, months_ahead: int = PARTITION_MONTHS_AHEAD) -> None:
+    current = dt.datetime.utcnow().date().replace(day=1)
+    for table in PARTITIONED_TABLES:
+        # DEFAULT-партиция страхует вставки, если задача обслуживания давно не запускалась.
+        await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+        month = current
+        for _ in range(months_ahead + 1):
+            await create_month_partition(conn, table, month)
+            month = next_month(month)
@@ -0,0 +1,214 @@
+import asyncio
+import datetime as dt
+from collections import Counter
+from typing import Optional
+
+from sqlalchemy import select, update, bindparam, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import (
+    RESERVATION_TTL,
+    RESERVATION_PAYMENT_GRACE,
+    RESERVATION_SWEEP_INTERVAL,
+    RESERVATION_SWEEP_BATCH_SIZE,
+)
+from app.logger import logger
+from app.db.session import SessionLocal
+from app.db.models import Product, ProductStatus, Reservation, ReservationStatus
+
+
+products = Product.__table__
+
+
+def change_quantity(delta):
+    # updated_at переприсваивается сам себе, чтобы не срабатывал onupdate:
+    # движение остатков не считается правкой карточки.
+    return {"quantity": Product.quantity + delta, "updated_at": Product.updated_at}
+
+
+async def reserve_product(
+    session: AsyncSession,
+    tenant: str,
+    product_id: int,
+    buyer_tg_id: int,
+    price: Optional[int] = None,
+):
+    # Строка товара блокируется до конца транзакции: повторные нажатия одного покупателя
+    # идут по очереди и находят уже созданную бронь вместо списания новой единицы.
+    stmt = select(Product.id, Product.title, Product.description, Product.price).where(
+        Product.id == product_id,
+        Product.tenant == tenant,
+        Product.status == ProductStatus.APPROVED,
+    )
+    if price is not None:
+        # Ссылки из кэша не протухают: оплату по старой цене отклоняем.
+        stmt = stmt.where(Product.price == price)
+    q = await session.execute(stmt.with_for_update())
+    product = q.first()
+    if not product:
+        await session.rollback()
+        return None, None
+
+    expires_at = dt.datetime.utcnow() + dt.timedelta(seconds=RESERVATION_TTL)
+    q = await session.execute(
+        update(Reservation)
+        .where(
+            Reservation.product_id == product_id,
+            Reservation.buyer_tg_id == buyer_tg_id,
+            Reservation.status == ReservationStatus.ACTIVE,
+            Reservation.expires_at > dt.datetime.utcnow(),
+        )
+        .values(expires_at=func.greatest(Reservation.expires_at, expires_at))
+        .returning(Reservation)
+        .execution_options(synchronize_session=False)
+    )
+    reservation = q.scalars().first()
+    if reservation:
+        await session.commit()
+        return product, reservation
+
+    q = await session.execute(
+        update(Product)
+        .where(Product.id == product_id, Product.quantity > 0)
+        .values(**change_quantity(-1))
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    )
+    if not q.first():
+        await session.rollback()
+        return None, None
+
+    reservation = Reservation(product_id=product_id, buyer_tg_id=buyer_tg_id, expires_at=expires_at)
+    session.add(reservation)
+    await session.commit()
+    return product, reservation
+
+
+async def hold_reservation(session: AsyncSession, reservation_id: int) -> bool:
+    # Проверка на pre_checkout: бронь должна быть жива, и её продлеваем на время оплаты,
+    # чтобы сборщик не вернул товар на склад между pre_checkout и successful_payment.
+    hold_until = dt.datetime.utcnow() + dt.timedelta(seconds=RESERVATION_PAYMENT_GRACE)
+    q = await session.execute(
+        update(Reservation)
+        .where(
+            Reservation.id == reservation_id,
+            Reservation.status == ReservationStatus.ACTIVE,
+            Reservation.expires_at > dt.datetime.utcnow(),
+        )
+        .values(expires_at=func.greatest(Reservation.expires_at, hold_until))
+        .returning(Reservation.id)
+        .execution_options(synchronize_session=False)
+    )
+    held = q.first() is not None
+    await session.commit()
+    return held
+
+
+# Коммит остаётся за вызывающим кодом: подтверждение идёт в одной транзакции с покупкой.
+async def confirm_reservation(session: AsyncSession, reservation_id: int) -> None:
+    q = await session.execute(
+        update(Reservation)
+        .where(Reservation.id == reservation_id, Reservation.status == ReservationStatus.ACTIVE)
+        .values(status=ReservationStatus.CONFIRMED)
+        .returning(Reservation.id)
+        .execution_options(synchronize_session=False)
+    )
+    if q.first():
+        return
+
+    # Бронь успели снять между pre_checkout и оплатой, а деньги уже списаны:
+    # товар всё равно продан, поэтому уменьшаем остаток заново.
+    q = await session.execute(
+        update(Reservation)
+        .where(Reservation.id == reservation_id, Reservation.status == ReservationStatus.RELEASED)
+        .values(status=ReservationStatus.CONFIRMED)
+        .returning(Reservation.product_id)
+        .execution_options(synchronize_session=False)
+    )
+    released = q.first()
+    if released:
+        q = await session.execute(
+            update(Product)
+            .where(Product.id == released.product_id, Product.quantity > 0)
+            .values(**change_quantity(-1))
+            .returning(Product.id)
+            .execution_options(synchronize_session=False)
+        )
+        if q.first():
+            logger.warning("Оплачена уже снятая бронь %s, товар %s", reservation_id, released.product_id)
+        else:
+            # Единицу успели продать другому: остаток не уводим в минус, а сообщаем о перепродаже.
+            logger.error(
+                "Перепродажа: оплачена снятая бронь %s, а товара %s уже нет в наличии",
+                reservation_id,
+                released.product_id,
+            )
+
+
+# Для инвойсов из кэша ссылок: payload общий для всех покупателей, бронь создаётся
+# на pre_checkout и находится по паре (товар, покупатель).
+async def confirm_buyer_reservation(session: AsyncSession, product_id: int, buyer_tg_id: int) -> None:
+    q = await session.execute(
+        select(Reservation.id)
+        .where(
+            Reservation.product_id == product_id,
+            Reservation.buyer_tg_id == buyer_tg_id,
+            Reservation.status != ReservationStatus.CONFIRMED,
+        )
+        .order_by(Reservation.id.desc())
+        .limit(1)
+    )
+    reservation_id = q.scalar_one_or_none()
+    if reservation_id:
+        await confirm_reservation(session, reservation_id)
+
+
+async def release_expired_reservations() -> int:
+    total = 0
+    async with SessionLocal() as session:
+        while True:
+            expired = (
+                select(Reservation.id)
+                .where(
+                    Reservation.status == ReservationStatus.ACTIVE,
+                    Reservation.expires_at < dt.datetime.utcnow(),
+                )
+                .order_by(Reservation.expires_at.asc())
+                .limit(RESERVATION_SWEEP_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            q = await session.execute(
+                update(Reservation)
+                .where(Reservation.id.in_(expired.scalar_subquery()))
+                .values(status=ReservationStatus.RELEASED)
+                .returning(Reservation.product_id)
+                .execution_options(synchronize_session=False)
+            )
+            released = Counter(q.scalars().all())
+            if released:
+                await session.execute(
+                    update(products)
+                    .where(products.c.id == bindparam("product_id"))
+                    .values(
+                        quantity=products.c.quantity + bindparam("released"),
+                        updated_at=products.c.updated_at,
+                    ),
+                    [{"product_id": pid, "released": n} for pid, n in sorted(released.items())],
+                )
+            await session.commit()
+
+            batch = sum(released.values())
+            total += batch
+            if batch < RESERVATION_SWEEP_BATCH_SIZE:
+                return total
+
+
+async def reservation_sweeper() -> None:
+    while True:
+        try:
+            released = await release_expired_reservations()
+            if released:
+                logger.info("Снято просроченных броней: %s", released)
+        except Exception:
+            logger.exception("Ошибка при снятии просроченных броней")
+        await asyncio.sleep(RESERVATION_SWEEP_INTERVAL)
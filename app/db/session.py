@@ -1,13 +1,51 @@
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncConnection, AsyncSession
 
 from app.config import DATABASE_URL
 from app.db.base import Base
+from app.db.models import SCHEMA_VERSION, SchemaVersion
+from app.db.partitions import ensure_partitions
+from app.db.upgrade import upgrade_schema
 
 
 engine = create_async_engine(DATABASE_URL, echo=False)
 SessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
+# Ключ advisory-лока: при rolling deploy реплики не гоняют create_all одновременно.
+SCHEMA_LOCK_KEY = 0x5C4E3A
 
-async def init_db() -> None:
+
+def create_missing_indexes(sync_conn) -> None:
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+async def stored_schema_version(conn: AsyncConnection) -> int | None:
+    if await conn.scalar(text("SELECT to_regclass('schema_version')")) is None:
+        return None
+    return await conn.scalar(select(SchemaVersion.version).where(SchemaVersion.id == 1))
+
+
+async def init_db() -> bool:
     async with engine.begin() as conn:
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+        stored_version = await stored_schema_version(conn)
+        if stored_version == SCHEMA_VERSION:
+            # Партиции на будущие месяцы досоздаст maintenance_loop сразу после старта.
+            return False
         await conn.run_sync(Base.metadata.create_all)
+        # Новые колонки старых таблиц — до индексов, которые на них опираются.
+        await upgrade_schema(conn, stored_version)
+        # create_all не добавляет новые индексы к уже существующим таблицам.
+        await conn.run_sync(create_missing_indexes)
+        await ensure_partitions(conn)
+        stmt = insert(SchemaVersion).values(id=1, version=SCHEMA_VERSION)
+        await conn.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[SchemaVersion.id],
+                set_={"version": stmt.excluded.version, "applied_at": stmt.excluded.applied_at},
+            )
+        )
+        return True
@@ -0,0 +1,79 @@
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import DEFAULT_TENANT
+from app.logger import logger
+from app.db.models import ProductCategory
+
+
+# create_all не меняет уже существующие таблицы, поэтому колонки и ограничения, добавленные
+# в модели позже, доводятся здесь. Шаг выполняется, если версия схемы в БД меньше его номера
+# (или её ещё нет); все операторы идемпотентны, на свежей базе они ничего не меняют.
+category_values = ", ".join(f"'{category.name}'" for category in ProductCategory)
+
+UPGRADE_STEPS: List[Tuple[int, List[str]]] = [
+    (
+        11,
+        [
+            f"""
+            DO $$ BEGIN
+                CREATE TYPE productcategory AS ENUM ({category_values});
+            EXCEPTION WHEN duplicate_object THEN NULL;
+            END $$
+            """,
+            f"ALTER TABLE users ADD COLUMN IF NOT EXISTS tenant VARCHAR(32) NOT NULL DEFAULT '{DEFAULT_TENANT}'",
+            "ALTER TABLE users ADD COLUMN IF NOT EXISTS last_seen_at TIMESTAMP WITHOUT TIME ZONE",
+            *[
+                f"""
+                ALTER TABLE {table}
+                    ADD COLUMN IF NOT EXISTS tenant VARCHAR(32) NOT NULL DEFAULT '{DEFAULT_TENANT}',
+                    ADD COLUMN IF NOT EXISTS quantity INTEGER NOT NULL DEFAULT 1,
+                    ADD COLUMN IF NOT EXISTS category productcategory NOT NULL DEFAULT 'OTHER'
+                """
+                for table in ("products", "products_archive")
+            ],
+        ],
+    ),
+    (
+        12,
+        [
+            # До витрин tg_id был уникален сам по себе (unique index ix_users_tg_id):
+            # с ним второй витрине нельзя завести того же Telegram-пользователя.
+            "DROP INDEX IF EXISTS ix_users_tg_id",
+            "ALTER TABLE users DROP CONSTRAINT IF EXISTS users_tg_id_key",
+            """
+            DO $$ BEGIN
+                ALTER TABLE users ADD CONSTRAINT users_tenant_tg_id_key UNIQUE (tenant, tg_id);
+            EXCEPTION WHEN duplicate_table OR duplicate_object THEN NULL;
+            END $$
+            """,
+        ],
+    ),
+    (
+        13,
+        [
+            # В условие частичных индексов каталога добавлен quantity > 0; create_missing_indexes
+            # пересоздаст их по модели.
+            *[
+                f"DROP INDEX IF EXISTS {name}"
+                for name in (
+                    "ix_products_catalog_new",
+                    "ix_products_catalog_cheap",
+                    "ix_products_catalog_category_new",
+                    "ix_products_catalog_category_cheap",
+                )
+            ],
+        ],
+    ),
+]
+
+
+async def upgrade_schema(conn: AsyncConnection, stored_version: Optional[int]) -> None:
+    for version, statements in UPGRADE_STEPS:
+        if stored_version is not None and stored_version >= version:
+            continue
+        for statement in statements:
+            await conn.execute(text(statement))
+        logger.info("Схема БД: применён шаг обновления %s", version)
@@ -3,12 +3,12 @@ from typing import Union
 from aiogram.filters import BaseFilter
 from aiogram.types import Message, CallbackQuery
 
-from app.config import ADMIN_IDS
+from app.config import BotConfig
 
 
 class AdminFilter(BaseFilter):
-    async def __call__(self, event: Union[Message, CallbackQuery]) -> bool:
+    async def __call__(self, event: Union[Message, CallbackQuery], tenant: BotConfig) -> bool:
         user = getattr(event, "from_user", None)
         if not user:
             return False
-        return user.id in ADMIN_IDS
+        return user.id in tenant.admin_ids
@@ -0,0 +1,123 @@
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from app.config import FSM_STATE_TTL, FSM_DEFAULT_TTL, FSM_MAX_CONTEXTS, FSM_SWEEP_INTERVAL
+from app.logger import logger
+
+
+@dataclass
+class StorageRecord:
+    state: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    expires_at: float = 0.0
+
+
+class TTLMemoryStorage(BaseStorage):
+    # В отличие от MemoryStorage, чтение не создаёт записей, пустой контекст удаляется,
+    # у каждого сценария своё время жизни, а общее число контекстов ограничено (LRU).
+    def __init__(
+        self,
+        state_ttl: Dict[str, int] = FSM_STATE_TTL,
+        default_ttl: int = FSM_DEFAULT_TTL,
+        max_contexts: int = FSM_MAX_CONTEXTS,
+    ) -> None:
+        self.state_ttl = state_ttl
+        self.default_ttl = default_ttl
+        self.max_contexts = max_contexts
+        self.records: "OrderedDict[StorageKey, StorageRecord]" = OrderedDict()
+        # Ключи с истёкшим сценарием, чтобы объяснить вернувшемуся пользователю, что произошло.
+        self.expired_keys: "OrderedDict[StorageKey, None]" = OrderedDict()
+        self.expired = 0
+        self.evicted = 0
+
+    def ttl(self, state: Optional[str]) -> int:
+        group = state.split(":", 1)[0] if state else None
+        return self.state_ttl.get(group, self.default_ttl)
+
+    def get_record(self, key: StorageKey) -> Optional[StorageRecord]:
+        record = self.records.get(key)
+        if not record:
+            return None
+        if record.expires_at <= time.monotonic():
+            self.expire(key)
+            return None
+        self.records.move_to_end(key)
+        return record
+
+    def put_record(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]) -> None:
+        self.expired_keys.pop(key, None)
+        if state is None and not data:
+            self.records.pop(key, None)
+            return
+        self.records[key] = StorageRecord(state, data, time.monotonic() + self.ttl(state))
+        self.records.move_to_end(key)
+        while len(self.records) > self.max_contexts:
+            evicted_key, evicted_record = self.records.popitem(last=False)
+            self.evicted += 1
+            self.remember_dropped(evicted_key, evicted_record)
+
+    def expire(self, key: StorageKey) -> None:
+        record = self.records.pop(key)
+        self.expired += 1
+        self.remember_dropped(key, record)
+
+    def remember_dropped(self, key: StorageKey, record: StorageRecord) -> None:
+        if not record.state:
+            return
+        self.expired_keys[key] = None
+        while len(self.expired_keys) > self.max_contexts:
+            self.expired_keys.popitem(last=False)
+
+    def pop_expired(self, key: StorageKey) -> bool:
+        if key not in self.expired_keys:
+            return False
+        del self.expired_keys[key]
+        return True
+
+    def sweep(self) -> int:
+        now = time.monotonic()
+        stale = [key for key, record in self.records.items() if record.expires_at <= now]
+        for key in stale:
+            self.expire(key)
+        return len(stale)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = self.get_record(key)
+        state = state.state if isinstance(state, State) else state
+        self.put_record(key, state, record.data if record else {})
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = self.get_record(key)
+        return record.state if record else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = self.get_record(key)
+        self.put_record(key, record.state if record else None, data.copy())
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = self.get_record(key)
+        return record.data.copy() if record else {}
+
+    async def close(self) -> None:
+        pass
+
+
+async def fsm_sweeper(storage: TTLMemoryStorage) -> None:
+    reported = (0, 0)
+    while True:
+        await asyncio.sleep(FSM_SWEEP_INTERVAL)
+        storage.sweep()
+        if (storage.expired, storage.evicted) != reported:
+            reported = (storage.expired, storage.evicted)
+            logger.info(
+                "FSM: контекстов %s, истекло всего %s, вытеснено всего %s",
+                len(storage.records),
+                storage.expired,
+                storage.evicted,
+            )
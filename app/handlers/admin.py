@@ -4,7 +4,9 @@ from aiogram import Router, F
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery
 from sqlalchemy import select, func
+from sqlalchemy.orm import contains_eager
 
+from app.config import BotConfig
 from app.filters.admin import AdminFilter
 from app.logger import logger
 from app.db.session import SessionLocal
@@ -12,9 +14,13 @@ from app.db.models import (
     User,
     Product,
     ProductStatus,
+    CATEGORY_TITLES,
     WithdrawalRequest,
     WithdrawalStatus,
+    MAX_PRICE,
+    MAX_QUANTITY,
 )
+from app.invoice_links import invoice_links
 from app.keyboards.admin import admin_menu, edit_product_keyboard
 from app.keyboards.common import main_menu
 from app.keyboards.inline import moderation_keyboard, withdrawals_keyboard
@@ -32,34 +38,36 @@ async def admin_menu_entry(message: Message):
 
 
 @router.message(F.text == "Назад")
-async def admin_back(message: Message):
+async def admin_back(message: Message, tenant: BotConfig):
     async with SessionLocal() as session:
-        q = await session.execute(select(User).where(User.tg_id == message.from_user.id))
+        q = await session.execute(
+            select(User).where(User.tenant == tenant.tenant, User.tg_id == message.from_user.id)
+        )
         user = q.scalar_one_or_none()
     is_admin = bool(user and user.is_admin)
     await message.answer("Главное меню", reply_markup=main_menu(is_admin=is_admin))
 
 
-async def get_first_pending_product(session):
+async def get_first_pending_product(session, tenant: str):
     q = await session.execute(
         select(Product)
-        .where(Product.status == ProductStatus.PENDING)
+        .where(Product.tenant == tenant, Product.status == ProductStatus.PENDING)
         .order_by(Product.id.asc())
     )
     return q.scalars().first()
 
 
-async def get_next_pending_product(session, current_id: int, direction: str):
+async def get_next_pending_product(session, tenant: str, current_id: int, direction: str):
     if direction == "next":
         stmt = (
             select(Product)
-            .where(Product.status == ProductStatus.PENDING, Product.id > current_id)
+            .where(Product.tenant == tenant, Product.status == ProductStatus.PENDING, Product.id > current_id)
             .order_by(Product.id.asc())
         )
     else:
         stmt = (
             select(Product)
-            .where(Product.status == ProductStatus.PENDING, Product.id < current_id)
+            .where(Product.tenant == tenant, Product.status == ProductStatus.PENDING, Product.id < current_id)
             .order_by(Product.id.desc())
         )
     q = await session.execute(stmt)
@@ -71,7 +79,9 @@ async def send_moderation_product(msg_or_cb, product: Product):
         f"ID: {product.id}\n"
         f"Автор: {product.user_id}\n\n"
         f"{product.title}\n"
-        f"Цена: {product.price/100:.2f} ₽\n\n"
+        f"Категория: {CATEGORY_TITLES[product.category]}\n"
+        f"Цена: {product.price/100:.2f} ₽\n"
+        f"В наличии: {product.quantity}\n\n"
         f"{product.description}"
     )
     kb = moderation_keyboard(product.id)
@@ -82,9 +92,9 @@ async def send_moderation_product(msg_or_cb, product: Product):
 
 
 @router.message(F.text == "Модерация")
-async def moderation_start(message: Message):
+async def moderation_start(message: Message, tenant: BotConfig):
     async with SessionLocal() as session:
-        product = await get_first_pending_product(session)
+        product = await get_first_pending_product(session, tenant.tenant)
     if not product:
         await message.answer("Нет карточек на модерации.")
         return
@@ -92,12 +102,12 @@ async def moderation_start(message: Message):
 
 
 @router.callback_query(F.data.startswith("mod_prev:") | F.data.startswith("mod_next:"))
-async def moderation_switch(callback: CallbackQuery):
+async def moderation_switch(callback: CallbackQuery, tenant: BotConfig):
     action, product_id_str = callback.data.split(":")
     direction = "next" if action == "mod_next" else "prev"
     current_id = int(product_id_str)
     async with SessionLocal() as session:
-        product = await get_next_pending_product(session, current_id, direction)
+        product = await get_next_pending_product(session, tenant.tenant, current_id, direction)
     if not product:
         await callback.answer("Больше карточек нет.")
         return
@@ -106,10 +116,12 @@ async def moderation_switch(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("mod_approve:"))
-async def moderation_approve(callback: CallbackQuery):
+async def moderation_approve(callback: CallbackQuery, tenant: BotConfig):
     product_id = int(callback.data.split(":")[1])
     async with SessionLocal() as session:
-        q = await session.execute(select(Product).where(Product.id == product_id))
+        q = await session.execute(
+            select(Product).where(Product.id == product_id, Product.tenant == tenant.tenant)
+        )
         product = q.scalar_one_or_none()
         if not product:
             await callback.answer("Карточка не найдена.")
@@ -122,16 +134,19 @@ async def moderation_approve(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("mod_reject:"))
-async def moderation_reject(callback: CallbackQuery):
+async def moderation_reject(callback: CallbackQuery, tenant: BotConfig):
     product_id = int(callback.data.split(":")[1])
     async with SessionLocal() as session:
-        q = await session.execute(select(Product).where(Product.id == product_id))
+        q = await session.execute(
+            select(Product).where(Product.id == product_id, Product.tenant == tenant.tenant)
+        )
         product = q.scalar_one_or_none()
         if not product:
             await callback.answer("Карточка не найдена.")
             return
         product.status = ProductStatus.REJECTED
         await session.commit()
+        invoice_links.invalidate(tenant.tenant, product.id, product.updated_at)
         logger.info("Карточка %s отклонена", product.id)
     await callback.answer("Отклонено.")
     await callback.message.delete()
@@ -153,6 +168,7 @@ async def edit_choose_field(message: Message, state: FSMContext):
         "Описание": "description",
         "Цена": "price",
         "Фото": "photo",
+        "Количество": "quantity",
     }
     if message.text == "Отмена":
         await state.clear()
@@ -169,6 +185,8 @@ async def edit_choose_field(message: Message, state: FSMContext):
 
     if field == "price":
         await message.answer("Новая цена в рублях (целое число):")
+    elif field == "quantity":
+        await message.answer("Сколько единиц в наличии (целое число):")
     elif field == "photo":
         await message.answer("Отправь новое фото:")
     else:
@@ -176,7 +194,7 @@ async def edit_choose_field(message: Message, state: FSMContext):
 
 
 @router.message(EditCardState.new_value)
-async def edit_new_value(message: Message, state: FSMContext):
+async def edit_new_value(message: Message, state: FSMContext, tenant: BotConfig):
     data = await state.get_data()
     product_id = data.get("edit_product_id")
     field = data.get("field")
@@ -187,7 +205,9 @@ async def edit_new_value(message: Message, state: FSMContext):
         return
 
     async with SessionLocal() as session:
-        q = await session.execute(select(Product).where(Product.id == product_id))
+        q = await session.execute(
+            select(Product).where(Product.id == product_id, Product.tenant == tenant.tenant)
+        )
         product = q.scalar_one_or_none()
         if not product:
             await state.clear()
@@ -198,7 +218,18 @@ async def edit_new_value(message: Message, state: FSMContext):
             if not message.text or not message.text.strip().isdigit():
                 await message.answer("Цена должна быть целым числом.")
                 return
+            if int(message.text.strip()) * 100 > MAX_PRICE:
+                await message.answer(f"Цена не может быть больше {MAX_PRICE // 100} ₽.")
+                return
             product.price = int(message.text.strip()) * 100
+        elif field == "quantity":
+            if not message.text or not message.text.strip().isdigit():
+                await message.answer("Количество должно быть целым числом.")
+                return
+            if int(message.text.strip()) > MAX_QUANTITY:
+                await message.answer(f"Количество не может быть больше {MAX_QUANTITY}.")
+                return
+            product.quantity = int(message.text.strip())
         elif field == "photo":
             if not message.photo:
                 await message.answer("Отправь фото.")
@@ -210,6 +241,7 @@ async def edit_new_value(message: Message, state: FSMContext):
             product.description = message.text.strip()
 
         await session.commit()
+        invoice_links.invalidate(tenant.tenant, product.id, product.updated_at)
         logger.info("Карточка %s обновлена, поле %s", product.id, field)
 
     await state.clear()
@@ -217,9 +249,9 @@ async def edit_new_value(message: Message, state: FSMContext):
 
 
 @router.message(F.text == "Статистика")
-async def statistics(message: Message):
+async def statistics(message: Message, tenant: BotConfig):
     async with SessionLocal() as session:
-        q = await session.execute(select(User))
+        q = await session.execute(select(User).where(User.tenant == tenant.tenant))
         users = q.scalars().all()
 
         lines = []
@@ -248,26 +280,34 @@ async def statistics(message: Message):
         await message.answer("\n".join(lines))
 
 
-async def get_first_withdraw(session):
-    q = await session.execute(
+def withdrawals_query(tenant: str):
+    return (
         select(WithdrawalRequest)
-        .where(WithdrawalRequest.status == WithdrawalStatus.PENDING)
+        .join(WithdrawalRequest.user)
+        .options(contains_eager(WithdrawalRequest.user))
+        .where(User.tenant == tenant, WithdrawalRequest.status == WithdrawalStatus.PENDING)
+    )
+
+
+async def get_first_withdraw(session, tenant: str):
+    q = await session.execute(
+        withdrawals_query(tenant)
         .order_by(WithdrawalRequest.id.asc())
     )
     return q.scalars().first()
 
 
-async def get_next_withdraw(session, current_id: int, direction: str):
+async def get_next_withdraw(session, tenant: str, current_id: int, direction: str):
     if direction == "next":
         stmt = (
-            select(WithdrawalRequest)
-            .where(WithdrawalRequest.status == WithdrawalStatus.PENDING, WithdrawalRequest.id > current_id)
+            withdrawals_query(tenant)
+            .where(WithdrawalRequest.id > current_id)
             .order_by(WithdrawalRequest.id.asc())
         )
     else:
         stmt = (
-            select(WithdrawalRequest)
-            .where(WithdrawalRequest.status == WithdrawalStatus.PENDING, WithdrawalRequest.id < current_id)
+            withdrawals_query(tenant)
+            .where(WithdrawalRequest.id < current_id)
             .order_by(WithdrawalRequest.id.desc())
         )
     q = await session.execute(stmt)
@@ -287,9 +327,9 @@ async def send_withdraw(msg_or_cb, wd: WithdrawalRequest):
 
 
 @router.message(F.text == "Заявки на вывод")
-async def withdrawals_start(message: Message):
+async def withdrawals_start(message: Message, tenant: BotConfig):
     async with SessionLocal() as session:
-        wd = await get_first_withdraw(session)
+        wd = await get_first_withdraw(session, tenant.tenant)
     if not wd:
         await message.answer("Нет заявок на вывод.")
         return
@@ -297,12 +337,12 @@ async def withdrawals_start(message: Message):
 
 
 @router.callback_query(F.data.startswith("wd_prev:") | F.data.startswith("wd_next:"))
-async def withdraw_switch(callback: CallbackQuery):
+async def withdraw_switch(callback: CallbackQuery, tenant: BotConfig):
     action, withdraw_id_str = callback.data.split(":")
     direction = "next" if action == "wd_next" else "prev"
     current_id = int(withdraw_id_str)
     async with SessionLocal() as session:
-        wd = await get_next_withdraw(session, current_id, direction)
+        wd = await get_next_withdraw(session, tenant.tenant, current_id, direction)
     if not wd:
         await callback.answer("Больше заявок нет.")
         return
@@ -311,11 +351,13 @@ async def withdraw_switch(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("wd_paid:"))
-async def withdraw_paid(callback: CallbackQuery):
+async def withdraw_paid(callback: CallbackQuery, tenant: BotConfig):
     withdraw_id = int(callback.data.split(":")[1])
     async with SessionLocal() as session:
         q = await session.execute(
-            select(WithdrawalRequest).where(WithdrawalRequest.id == withdraw_id)
+            select(WithdrawalRequest)
+            .join(WithdrawalRequest.user)
+            .where(WithdrawalRequest.id == withdraw_id, User.tenant == tenant.tenant)
         )
         wd = q.scalar_one_or_none()
         if not wd:
@@ -10,39 +10,70 @@ from aiogram.types import (
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.config import ADMIN_IDS, PAYMENT_PROVIDER_TOKEN
+from app.config import BotConfig, INVOICE_LINK_CACHE
 from app.logger import logger
 from app.db.session import SessionLocal
-from app.db.models import User, Product, ProductStatus, Purchase, WithdrawalRequest
-from app.keyboards.common import main_menu
-from app.keyboards.inline import product_browse_keyboard
+from app.db.models import (
+    User,
+    Product,
+    ProductStatus,
+    ProductCategory,
+    Purchase,
+    WithdrawalRequest,
+    CATEGORY_TITLES,
+    STATUS_TITLES,
+    MAX_PRICE,
+    MAX_QUANTITY,
+)
+from app.db.catalog import CatalogFilter, get_catalog_product
+from app.db.history import get_purchases_page, get_seller_products_page, get_sales_counts
+from app.db.reservations import (
+    reserve_product,
+    hold_reservation,
+    confirm_reservation,
+    confirm_buyer_reservation,
+)
+from app.invoice_links import invoice_links
+from app.activity import activity
+from app.keyboards.common import main_menu, category_keyboard
+from app.keyboards.inline import (
+    product_browse_keyboard,
+    catalog_filter_keyboard,
+    invoice_link_keyboard,
+    history_keyboard,
+)
 from app.states.add_card import AddCardState
 from app.states.withdraw import WithdrawState
+from app.states.bulk_upload import BulkUploadState
+from app.bulk_upload import iter_csv_rows, iter_json_rows, import_products
 
 
 router = Router()
 
 
-async def get_or_create_user(session: AsyncSession, tg_user) -> User:
-    q = await session.execute(select(User).where(User.tg_id == tg_user.id))
+async def get_or_create_user(session: AsyncSession, tg_user, tenant: BotConfig) -> User:
+    q = await session.execute(
+        select(User).where(User.tenant == tenant.tenant, User.tg_id == tg_user.id)
+    )
     user = q.scalar_one_or_none()
     if not user:
         user = User(
+            tenant=tenant.tenant,
             tg_id=tg_user.id,
             username=tg_user.username,
-            is_admin=tg_user.id in ADMIN_IDS,
+            is_admin=tg_user.id in tenant.admin_ids,
         )
         session.add(user)
         await session.commit()
         await session.refresh(user)
-        logger.info("Создан пользователь %s", tg_user.id)
+        logger.info("Создан пользователь %s в витрине %s", tg_user.id, tenant.tenant)
     return user
 
 
 @router.message(CommandStart())
-async def cmd_start(message: Message):
+async def cmd_start(message: Message, tenant: BotConfig):
     async with SessionLocal() as session:
-        user = await get_or_create_user(session, message.from_user)
+        user = await get_or_create_user(session, message.from_user, tenant)
     await message.answer(
         "Привет. Это тестовый маркетплейс-бот.",
         reply_markup=main_menu(is_admin=user.is_admin),
@@ -76,13 +107,44 @@ async def add_card_price(message: Message, state: FSMContext):
         await message.answer("Нужно целое число. Попробуй ещё раз.")
         return
     price_rub = int(text)
+    if price_rub * 100 > MAX_PRICE:
+        await message.answer(f"Цена не может быть больше {MAX_PRICE // 100} ₽.")
+        return
     await state.update_data(price=price_rub * 100)
+    await state.set_state(AddCardState.quantity)
+    await message.answer("Сколько единиц в наличии (целое число):")
+
+
+@router.message(AddCardState.quantity)
+async def add_card_quantity(message: Message, state: FSMContext):
+    text = (message.text or "").strip()
+    if not text.isdigit() or int(text) <= 0:
+        await message.answer("Нужно целое положительное число. Попробуй ещё раз.")
+        return
+    if int(text) > MAX_QUANTITY:
+        await message.answer(f"Количество не может быть больше {MAX_QUANTITY}.")
+        return
+    await state.update_data(quantity=int(text))
+    await state.set_state(AddCardState.category)
+    await message.answer("Выбери категорию:", reply_markup=category_keyboard())
+
+
+@router.message(AddCardState.category)
+async def add_card_category(message: Message, state: FSMContext):
+    category = next(
+        (category for category, title in CATEGORY_TITLES.items() if title == message.text),
+        None,
+    )
+    if not category:
+        await message.answer("Выбери категорию с клавиатуры.", reply_markup=category_keyboard())
+        return
+    await state.update_data(category=category.value)
     await state.set_state(AddCardState.photo)
     await message.answer("Отправь фото товара или напиши 'нет':")
 
 
 @router.message(AddCardState.photo)
-async def add_card_photo(message: Message, state: FSMContext):
+async def add_card_photo(message: Message, state: FSMContext, tenant: BotConfig):
     photo_file_id = None
     if message.photo:
         photo_file_id = message.photo[-1].file_id
@@ -94,12 +156,15 @@ async def add_card_photo(message: Message, state: FSMContext):
     await state.clear()
 
     async with SessionLocal() as session:
-        user = await get_or_create_user(session, message.from_user)
+        user = await get_or_create_user(session, message.from_user, tenant)
         product = Product(
+            tenant=tenant.tenant,
             user_id=user.id,
             title=data["title"],
             description=data["description"],
             price=data["price"],
+            quantity=data["quantity"],
+            category=ProductCategory(data["category"]),
             photo_file_id=photo_file_id,
             status=ProductStatus.PENDING,
         )
@@ -107,43 +172,82 @@ async def add_card_photo(message: Message, state: FSMContext):
         await session.commit()
         logger.info("Пользователь %s создал карточку %s в статусе pending", user.tg_id, product.id)
 
-    await message.answer("Карточка создана и отправлена на модерацию.")
+    await message.answer(
+        "Карточка создана и отправлена на модерацию.",
+        reply_markup=main_menu(is_admin=user.is_admin),
+    )
+
 
+# Bot API отдаёт ботам файлы размером до 20 МБ.
+MAX_UPLOAD_FILE_SIZE = 20 * 1024 * 1024
 
-async def get_first_approved_product(session: AsyncSession) -> Product | None:
-    q = await session.execute(
-        select(Product)
-        .where(Product.status == ProductStatus.APPROVED)
-        .order_by(Product.id.asc())
+
+@router.message(F.text == "Загрузить списком")
+async def bulk_upload_start(message: Message, state: FSMContext):
+    await state.set_state(BulkUploadState.document)
+    await message.answer(
+        "Пришли файл .csv, .json или .jsonl с товарами.\n"
+        "Поля: title, description, price (в рублях, целое число), quantity (по умолчанию 1), category (необязательно).\n"
+        "Все карточки уйдут на модерацию. Напиши 'отмена', чтобы выйти."
     )
-    return q.scalars().first()
 
 
-async def get_next_product(session: AsyncSession, current_id: int, direction: str) -> Product | None:
-    if direction == "next":
-        stmt = (
-            select(Product)
-            .where(Product.status == ProductStatus.APPROVED, Product.id > current_id)
-            .order_by(Product.id.asc())
-        )
+@router.message(BulkUploadState.document)
+async def bulk_upload_document(message: Message, state: FSMContext, tenant: BotConfig):
+    document = message.document
+    if not document:
+        if message.text and message.text.lower() == "отмена":
+            await state.clear()
+            await message.answer("Загрузка отменена.")
+            return
+        await message.answer("Пришли файл документом или напиши 'отмена'.")
+        return
+
+    name = (document.file_name or "").lower()
+    if name.endswith(".csv"):
+        parse_rows = iter_csv_rows
+    elif name.endswith(".json") or name.endswith(".jsonl"):
+        parse_rows = iter_json_rows
     else:
-        stmt = (
-            select(Product)
-            .where(Product.status == ProductStatus.APPROVED, Product.id < current_id)
-            .order_by(Product.id.desc())
-        )
-    q = await session.execute(stmt)
-    return q.scalars().first()
+        await message.answer("Поддерживаются только .csv, .json и .jsonl.")
+        return
+    if document.file_size and document.file_size > MAX_UPLOAD_FILE_SIZE:
+        await message.answer("Файл больше 20 МБ, раздели его на части.")
+        return
 
+    await state.clear()
+    stream = await message.bot.download(document)
 
-async def send_product(message_or_cb, product: Product):
+    async with SessionLocal() as session:
+        user = await get_or_create_user(session, message.from_user, tenant)
+        result = await import_products(session, tenant.tenant, user.id, parse_rows(stream))
+    logger.info(
+        "Пользователь %s загрузил список: принято %s, отклонено %s",
+        user.tg_id,
+        result.accepted,
+        result.rejected,
+    )
+
+    lines = [f"Принято на модерацию: {result.accepted}", f"Отклонено: {result.rejected}"]
+    if result.errors:
+        lines.append("")
+        lines.extend(result.errors)
+        if result.rejected > len(result.errors):
+            lines.append("…")
+    await message.answer("\n".join(lines))
+
+
+async def send_product(message_or_cb, product: Product, sort_key: int, flt: CatalogFilter):
     text = (
         f"Товар #{product.id}\n\n"
         f"{product.title}\n"
-        f"Цена: {product.price/100:.2f} ₽\n\n"
+        f"Категория: {CATEGORY_TITLES[product.category]}\n"
+        f"Цена: {product.price/100:.2f} ₽\n"
+        f"В наличии: {product.quantity}\n\n"
         f"{product.description}"
     )
-    kb = product_browse_keyboard(product.id)
+    kb = product_browse_keyboard(product.id, sort_key, flt)
+    activity.record_view(product.id)
     if product.photo_file_id:
         await message_or_cb.answer_photo(product.photo_file_id, caption=text, reply_markup=kb)
     else:
@@ -152,82 +256,187 @@ async def send_product(message_or_cb, product: Product):
 
 @router.message(F.text == "Посмотреть карточки")
 async def view_cards(message: Message):
+    flt = CatalogFilter()
+    await message.answer("Выбери фильтры каталога:", reply_markup=catalog_filter_keyboard(flt))
+
+
+@router.callback_query(F.data.startswith("cat_f:"))
+async def catalog_filter(callback: CallbackQuery):
+    flt = CatalogFilter.unpack(callback.data.split(":", 1)[1])
+    kb = catalog_filter_keyboard(flt)
+    if callback.message.text:
+        # Повторное нажатие на уже выбранный вариант: Telegram отклонил бы правку без изменений.
+        if callback.message.reply_markup != kb:
+            await callback.message.edit_reply_markup(reply_markup=kb)
+    else:
+        await callback.message.answer("Выбери фильтры каталога:", reply_markup=kb)
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("cat_show:"))
+async def catalog_show(callback: CallbackQuery, tenant: BotConfig):
+    flt = CatalogFilter.unpack(callback.data.split(":", 1)[1])
     async with SessionLocal() as session:
-        product = await get_first_approved_product(session)
+        product, sort_key = await get_catalog_product(session, tenant.tenant, flt)
     if not product:
-        await message.answer("Пока нет одобренных карточек.")
+        await callback.answer("Нет карточек под эти фильтры.")
         return
-    await send_product(message, product)
+    await callback.message.delete()
+    await send_product(callback.message, product, sort_key, flt)
+    await callback.answer()
+
+
+def parse_browse_callback(data: str):
+    # prod_next:<id>:<ключ сортировки>:<фильтр>; у кнопок, отправленных до фильтров, только id.
+    parts = data.split(":")
+    if len(parts) == 2:
+        return parts[0], CatalogFilter(), (0, int(parts[1]))
+    action, product_id_str, sort_key_str, raw_filter = parts
+    return action, CatalogFilter.unpack(raw_filter), (int(sort_key_str), int(product_id_str))
 
 
 @router.callback_query(F.data.startswith("prod_prev:") | F.data.startswith("prod_next:"))
-async def product_switch(callback: CallbackQuery):
-    action, product_id_str = callback.data.split(":")
+async def product_switch(callback: CallbackQuery, tenant: BotConfig):
+    action, flt, cursor = parse_browse_callback(callback.data)
     direction = "next" if action == "prod_next" else "prev"
-    current_id = int(product_id_str)
     async with SessionLocal() as session:
-        product = await get_next_product(session, current_id, direction)
+        product, sort_key = await get_catalog_product(session, tenant.tenant, flt, cursor, direction)
     if not product:
         await callback.answer("Больше товаров нет.")
         return
     await callback.message.delete()
-    await send_product(callback.message, product)
+    await send_product(callback.message, product, sort_key, flt)
+    await callback.answer()
 
 
-@router.callback_query(F.data.startswith("prod_buy:"))
-async def product_buy(callback: CallbackQuery):
-    product_id = int(callback.data.split(":")[1])
+async def get_invoice_link(callback: CallbackQuery, tenant: BotConfig, product_id: int) -> str | None:
+    link = invoice_links.get(tenant.tenant, product_id)
+    if link:
+        return link
+
     async with SessionLocal() as session:
         q = await session.execute(
             select(Product).where(
                 Product.id == product_id,
+                Product.tenant == tenant.tenant,
                 Product.status == ProductStatus.APPROVED,
             )
         )
         product = q.scalar_one_or_none()
     if not product:
-        await callback.answer("Товар недоступен.")
+        return None
+
+    link = await callback.bot.create_invoice_link(
+        title=product.title,
+        description=product.description[:200],
+        payload=f"product_{product.id}",
+        provider_token=tenant.payment_provider_token,
+        currency="rub",
+        prices=[LabeledPrice(label=product.title, amount=product.price)],
+    )
+    invoice_links.put(tenant.tenant, product.id, product.updated_at, link)
+    return link
+
+
+@router.callback_query(F.data.startswith("prod_buy:"))
+async def product_buy(callback: CallbackQuery, tenant: BotConfig):
+    product_id = int(callback.data.split(":")[1])
+    if INVOICE_LINK_CACHE:
+        # Бронь в этом режиме создаётся на pre_checkout, нажатие «Купить» не трогает БД.
+        link = await get_invoice_link(callback, tenant, product_id)
+        if not link:
+            await callback.answer("Товар недоступен.")
+            return
+        await callback.message.answer(
+            f"Счёт на оплату товара #{product_id}:",
+            reply_markup=invoice_link_keyboard(link),
+        )
+        await callback.answer()
+        return
+
+    async with SessionLocal() as session:
+        product, reservation = await reserve_product(
+            session,
+            tenant.tenant,
+            product_id,
+            callback.from_user.id,
+        )
+    if not product:
+        await callback.answer("Товар закончился или недоступен.")
         return
 
     prices = [LabeledPrice(label=product.title, amount=product.price)]
-    payload = f"product_{product.id}"
+    payload = f"product_{product.id}_{reservation.id}"
 
     await callback.message.answer_invoice(
         title=product.title,
         description=product.description[:200],
         payload=payload,
-        provider_token=PAYMENT_PROVIDER_TOKEN,
+        provider_token=tenant.payment_provider_token,
         currency="rub",
         prices=prices,
     )
     await callback.answer()
 
 
+def parse_payload(payload: str):
+    # product_<id>_<reservation_id>; у старых инвойсов брони нет.
+    parts = payload.split("_")
+    reservation_id = int(parts[2]) if len(parts) > 2 else None
+    return int(parts[1]), reservation_id
+
+
 @router.pre_checkout_query()
-async def process_pre_checkout(pre_checkout: PreCheckoutQuery):
+async def process_pre_checkout(pre_checkout: PreCheckoutQuery, tenant: BotConfig):
+    payload = pre_checkout.invoice_payload
+    if payload.startswith("product_"):
+        product_id, reservation_id = parse_payload(payload)
+        async with SessionLocal() as session:
+            if reservation_id:
+                active = await hold_reservation(session, reservation_id)
+                error_message = "Бронь истекла, нажми «Купить» ещё раз."
+            else:
+                product, _ = await reserve_product(
+                    session,
+                    tenant.tenant,
+                    product_id,
+                    pre_checkout.from_user.id,
+                    price=pre_checkout.total_amount,
+                )
+                active = product is not None
+                error_message = "Товар закончился или его цена изменилась, открой карточку заново."
+        if not active:
+            await pre_checkout.answer(ok=False, error_message=error_message)
+            return
     await pre_checkout.answer(ok=True)
 
 
 @router.message(F.successful_payment)
-async def successful_payment(message: Message):
+async def successful_payment(message: Message, tenant: BotConfig):
     payload = message.successful_payment.invoice_payload
     if not payload.startswith("product_"):
         return
-    product_id = int(payload.split("_")[1])
+    product_id, reservation_id = parse_payload(payload)
     amount = message.successful_payment.total_amount
 
     async with SessionLocal() as session:
-        q = await session.execute(select(Product).where(Product.id == product_id))
+        q = await session.execute(
+            select(Product).where(Product.id == product_id, Product.tenant == tenant.tenant)
+        )
         product = q.scalar_one_or_none()
         if not product:
             return
 
         q_seller = await session.execute(select(User).where(User.id == product.user_id))
         seller = q_seller.scalar_one_or_none()
-        buyer = await get_or_create_user(session, message.from_user)
+        buyer = await get_or_create_user(session, message.from_user, tenant)
         if not seller:
             return
 
+        if reservation_id:
+            await confirm_reservation(session, reservation_id)
+        else:
+            await confirm_buyer_reservation(session, product.id, message.from_user.id)
         seller.balance += amount
         purchase = Purchase(
             buyer_id=buyer.id,
@@ -248,9 +457,9 @@ async def successful_payment(message: Message):
 
 
 @router.message(F.text == "Баланс")
-async def show_balance(message: Message, state: FSMContext):
+async def show_balance(message: Message, state: FSMContext, tenant: BotConfig):
     async with SessionLocal() as session:
-        user = await get_or_create_user(session, message.from_user)
+        user = await get_or_create_user(session, message.from_user, tenant)
     balance_rub = user.balance / 100
 
     from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
@@ -265,10 +474,71 @@ async def show_balance(message: Message, state: FSMContext):
     await message.answer(f"Твой баланс: {balance_rub:.2f} ₽", reply_markup=kb)
 
 
+def page_arrows(has_more: bool, cursor, direction: str):
+    if direction == "next":
+        return cursor is not None, has_more
+    return has_more, True
+
+
+async def render_purchases(session: AsyncSession, user: User, cursor=None, direction: str = "next"):
+    rows, has_more = await get_purchases_page(session, user.id, cursor, direction)
+    if not rows:
+        return None, None
+    lines = ["Мои покупки:", ""]
+    for row in rows:
+        lines.append(f"{row.created_at:%d.%m.%Y} · {row.title} — {row.amount/100:.2f} ₽")
+    has_prev, has_next = page_arrows(has_more, cursor, direction)
+    return "\n".join(lines), history_keyboard("my_buys", rows[0].id, rows[-1].id, has_prev, has_next)
+
+
+async def render_seller_products(session: AsyncSession, user: User, cursor=None, direction: str = "next"):
+    rows, has_more = await get_seller_products_page(session, user.id, cursor, direction)
+    if not rows:
+        return None, None
+    sales = await get_sales_counts(session, [row.id for row in rows])
+    lines = ["Мои карточки:", ""]
+    for row in rows:
+        lines.append(
+            f"#{row.id} {row.title} — {row.price/100:.2f} ₽, {STATUS_TITLES[row.status]}, "
+            f"в наличии {row.quantity}, продано {sales.get(row.id, 0)}"
+        )
+    has_prev, has_next = page_arrows(has_more, cursor, direction)
+    return "\n".join(lines), history_keyboard("my_cards", rows[0].id, rows[-1].id, has_prev, has_next)
+
+
+HISTORY_SCREENS = {
+    "my_buys": (render_purchases, "Покупок пока нет."),
+    "my_cards": (render_seller_products, "Карточек пока нет."),
+}
+
+
+@router.message(F.text.in_({"Мои покупки", "Мои карточки"}))
+async def show_history(message: Message, tenant: BotConfig):
+    render, empty_text = HISTORY_SCREENS["my_buys" if message.text == "Мои покупки" else "my_cards"]
+    async with SessionLocal() as session:
+        user = await get_or_create_user(session, message.from_user, tenant)
+        text, kb = await render(session, user)
+    await message.answer(text or empty_text, reply_markup=kb)
+
+
+@router.callback_query(F.data.startswith("my_buys:") | F.data.startswith("my_cards:"))
+async def history_page(callback: CallbackQuery, tenant: BotConfig):
+    action, direction, cursor_str = callback.data.split(":")
+    render, _ = HISTORY_SCREENS[action]
+    async with SessionLocal() as session:
+        user = await get_or_create_user(session, callback.from_user, tenant)
+        text, kb = await render(session, user, int(cursor_str), direction)
+    if not text:
+        await callback.answer("Больше ничего нет.")
+        return
+    await callback.message.edit_text(text, reply_markup=kb)
+    await callback.answer()
+
+
 @router.message(F.text == "Вывести")
-async def withdraw_start(message: Message, state: FSMContext):
+async def withdraw_start(message: Message, state: FSMContext, tenant: BotConfig):
     async with SessionLocal() as session:
-        user = await get_or_create_user(session, message.from_user)
+        user = await get_or_create_user(session, message.from_user, tenant)
     if user.balance <= 0:
         await message.answer("Баланс нулевой, выводить нечего.")
         return
@@ -277,9 +547,9 @@ async def withdraw_start(message: Message, state: FSMContext):
 
 
 @router.message(WithdrawState.details)
-async def withdraw_details(message: Message, state: FSMContext):
+async def withdraw_details(message: Message, state: FSMContext, tenant: BotConfig):
     async with SessionLocal() as session:
-        user = await get_or_create_user(session, message.from_user)
+        user = await get_or_create_user(session, message.from_user, tenant)
         if user.balance <= 0:
             await state.clear()
             await message.answer("Баланс нулевой, вывод невозможен.")
@@ -302,7 +572,7 @@ async def withdraw_details(message: Message, state: FSMContext):
 
 
 @router.message(F.text == "Назад")
-async def back_to_main(message: Message):
+async def back_to_main(message: Message, tenant: BotConfig):
     async with SessionLocal() as session:
-        user = await get_or_create_user(session, message.from_user)
+        user = await get_or_create_user(session, message.from_user, tenant)
     await message.answer("Главное меню", reply_markup=main_menu(is_admin=user.is_admin))
@@ -0,0 +1,43 @@
+import time
+from typing import Dict
+
+from aiohttp import web
+
+from app.config import HEALTH_HOST, HEALTH_PORT
+from app.logger import logger
+
+
+class HealthState:
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.ready = False
+        self.phases: Dict[str, float] = {}
+
+    def snapshot(self) -> dict:
+        return {
+            "ready": self.ready,
+            "uptime": round(time.monotonic() - self.started, 3),
+            "phases": {name: round(seconds, 3) for name, seconds in self.phases.items()},
+        }
+
+
+health = HealthState()
+
+
+async def healthz(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok"})
+
+
+async def readyz(request: web.Request) -> web.Response:
+    return web.json_response(health.snapshot(), status=200 if health.ready else 503)
+
+
+async def start_health_server(host: str = HEALTH_HOST, port: int = HEALTH_PORT) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get("/healthz", healthz)
+    app.router.add_get("/readyz", readyz)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Пробы здоровья слушают %s:%s", host, port)
+    return runner
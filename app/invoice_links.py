@@ -0,0 +1,39 @@
+import datetime as dt
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.config import INVOICE_LINK_CACHE_SIZE
+
+
+class InvoiceLinkCache:
+    # (витрина, product_id) -> (updated_at, ссылка): ссылку создаёт бот конкретной витрины.
+    # После invalidate остаётся запись без ссылки с новой версией,
+    # чтобы ссылка, созданная по устаревшей карточке параллельным запросом, не попала обратно в кэш.
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[dt.datetime, Optional[str]]]" = OrderedDict()
+
+    def get(self, tenant: str, product_id: int) -> Optional[str]:
+        entry = self._entries.get((tenant, product_id))
+        if not entry:
+            return None
+        self._entries.move_to_end((tenant, product_id))
+        return entry[1]
+
+    def put(self, tenant: str, product_id: int, updated_at: dt.datetime, link: str) -> None:
+        entry = self._entries.get((tenant, product_id))
+        if entry and entry[0] > updated_at:
+            return
+        self._store((tenant, product_id), updated_at, link)
+
+    def invalidate(self, tenant: str, product_id: int, updated_at: dt.datetime) -> None:
+        self._store((tenant, product_id), updated_at, None)
+
+    def _store(self, key: Tuple[str, int], updated_at: dt.datetime, link: Optional[str]) -> None:
+        self._entries[key] = (updated_at, link)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+invoice_links = InvoiceLinkCache(INVOICE_LINK_CACHE_SIZE)
@@ -15,6 +15,7 @@ def edit_product_keyboard() -> ReplyKeyboardMarkup:
     buttons = [
         [KeyboardButton(text="Название"), KeyboardButton(text="Описание")],
         [KeyboardButton(text="Цена"), KeyboardButton(text="Фото")],
+        [KeyboardButton(text="Количество")],
         [KeyboardButton(text="Отмена")],
     ]
     return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True, one_time_keyboard=True)
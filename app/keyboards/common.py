@@ -1,12 +1,24 @@
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
 
+from app.db.models import CATEGORY_TITLES
+
 
 def main_menu(is_admin: bool = False) -> ReplyKeyboardMarkup:
     buttons = [
-        [KeyboardButton(text="Добавить карточку")],
+        [KeyboardButton(text="Добавить карточку"), KeyboardButton(text="Загрузить списком")],
         [KeyboardButton(text="Посмотреть карточки")],
+        [KeyboardButton(text="Мои покупки"), KeyboardButton(text="Мои карточки")],
         [KeyboardButton(text="Баланс")],
     ]
     if is_admin:
         buttons.append([KeyboardButton(text="Админ меню")])
     return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True)
+
+
+def category_keyboard() -> ReplyKeyboardMarkup:
+    titles = list(CATEGORY_TITLES.values())
+    buttons = [
+        [KeyboardButton(text=title) for title in titles[i:i + 2]]
+        for i in range(0, len(titles), 2)
+    ]
+    return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True, one_time_keyboard=True)
@@ -1,13 +1,51 @@
+from dataclasses import replace
+
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from aiogram.types import InlineKeyboardMarkup
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from app.db.catalog import CatalogFilter, PRICE_RANGES, SORT_TITLES
+from app.db.models import CATEGORY_TITLES
 
 
-def product_browse_keyboard(product_id: int) -> InlineKeyboardMarkup:
+def product_browse_keyboard(product_id: int, sort_key: int, flt: CatalogFilter) -> InlineKeyboardMarkup:
+    cursor = f"{product_id}:{sort_key}:{flt.pack()}"
     kb = InlineKeyboardBuilder()
-    kb.button(text="«", callback_data=f"prod_prev:{product_id}")
+    kb.button(text="«", callback_data=f"prod_prev:{cursor}")
     kb.button(text="Купить", callback_data=f"prod_buy:{product_id}")
-    kb.button(text="»", callback_data=f"prod_next:{product_id}")
-    kb.adjust(3)
+    kb.button(text="»", callback_data=f"prod_next:{cursor}")
+    kb.button(text="Фильтры", callback_data=f"cat_f:{flt.pack()}")
+    kb.adjust(3, 1)
+    return kb.as_markup()
+
+
+def catalog_filter_keyboard(flt: CatalogFilter) -> InlineKeyboardMarkup:
+    def button(text: str, selected: bool, new_flt: CatalogFilter) -> InlineKeyboardButton:
+        return InlineKeyboardButton(
+            text=f"✓ {text}" if selected else text,
+            callback_data=f"cat_f:{new_flt.pack()}",
+        )
+
+    kb = InlineKeyboardBuilder()
+    kb.row(
+        button("Все категории", flt.category is None, replace(flt, category=None)),
+        *[
+            button(title, flt.category == category, replace(flt, category=category))
+            for category, title in CATEGORY_TITLES.items()
+        ],
+        width=3,
+    )
+    kb.row(
+        *[
+            button(title, flt.price_range == index, replace(flt, price_range=index))
+            for index, (title, _, _) in enumerate(PRICE_RANGES)
+        ],
+        width=3,
+    )
+    kb.row(
+        *[button(title, flt.sort == sort, replace(flt, sort=sort)) for sort, title in SORT_TITLES.items()],
+        width=2,
+    )
+    kb.row(InlineKeyboardButton(text="Показать", callback_data=f"cat_show:{flt.pack()}"))
     return kb.as_markup()
 
 
@@ -29,3 +67,21 @@ def withdrawals_keyboard(withdraw_id: int) -> InlineKeyboardMarkup:
     kb.button(text="»", callback_data=f"wd_next:{withdraw_id}")
     kb.adjust(3)
     return kb.as_markup()
+
+
+def invoice_link_keyboard(link: str) -> InlineKeyboardMarkup:
+    kb = InlineKeyboardBuilder()
+    kb.button(text="Оплатить", url=link)
+    return kb.as_markup()
+
+
+def history_keyboard(action: str, first_id: int, last_id: int, has_prev: bool, has_next: bool) -> InlineKeyboardMarkup | None:
+    kb = InlineKeyboardBuilder()
+    if has_prev:
+        kb.button(text="«", callback_data=f"{action}:prev:{first_id}")
+    if has_next:
+        kb.button(text="»", callback_data=f"{action}:next:{last_id}")
+    if not has_prev and not has_next:
+        return None
+    kb.adjust(2)
+    return kb.as_markup()
@@ -0,0 +1,25 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import Message
+
+from app.fsm_storage import TTLMemoryStorage
+
+
+class FSMExpiryMiddleware(BaseMiddleware):
+    def __init__(self, storage: TTLMemoryStorage) -> None:
+        self.storage = storage
+
+    async def __call__(
+        self,
+        handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
+        event: Message,
+        data: Dict[str, Any],
+    ) -> Any:
+        state = data.get("state")
+        expired = bool(state) and self.storage.pop_expired(state.key)
+        result = await handler(event, data)
+        if expired and result is UNHANDLED:
+            await event.answer("Ты долго не отвечал, и незаконченное действие сброшено. Начни заново из меню.")
+        return result
@@ -0,0 +1,21 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from app.config import BotConfig
+
+
+class TenantMiddleware(BaseMiddleware):
+    # Кладёт в data["tenant"] конфиг витрины того бота, который получил апдейт.
+    def __init__(self, tenants: Dict[int, BotConfig]) -> None:
+        self.tenants = tenants
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        data["tenant"] = self.tenants[data["bot"].id]
+        return await handler(event, data)
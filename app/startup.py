@@ -0,0 +1,85 @@
+import asyncio
+import time
+from contextlib import AsyncExitStack, contextmanager
+from typing import List
+
+from sqlalchemy import select
+
+from app.config import STARTUP_WARM_PRODUCTS, STARTUP_WARM_USERS
+from app.logger import logger
+from app.health import health
+from app.db.session import SessionLocal, engine
+from app.db.models import Product, ProductStatus, User
+from app.db.catalog import SORT_TITLES, CatalogFilter, get_catalog_product
+
+
+@contextmanager
+def startup_phase(name: str):
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        health.phases[name] = time.monotonic() - started
+        logger.info("Старт, фаза %s: %.3f с", name, health.phases[name])
+
+
+async def warm_pool() -> None:
+    # Соединения открываются одновременно и держатся до конца, иначе пул отдавал бы одно и то же.
+    async with AsyncExitStack() as stack:
+        results = await asyncio.gather(
+            *(stack.enter_async_context(engine.connect()) for _ in range(engine.pool.size())),
+            return_exceptions=True,
+        )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+
+async def warm_catalog(tenants: List[str]) -> int:
+    # Проходит по частичному индексу каталога и первым страницам всех сортировок,
+    # чтобы первые «Посмотреть карточки» после деплоя читали страницы из shared buffers.
+    total = 0
+    async with SessionLocal() as session:
+        for tenant in tenants:
+            q = await session.execute(
+                select(Product.id)
+                .where(
+                    Product.tenant == tenant,
+                    Product.status == ProductStatus.APPROVED,
+                    Product.quantity > 0,
+                )
+                .order_by(Product.id.desc())
+                .limit(STARTUP_WARM_PRODUCTS)
+            )
+            total += len(q.scalars().all())
+            for sort in SORT_TITLES:
+                await get_catalog_product(session, tenant, CatalogFilter(sort=sort))
+    return total
+
+
+async def warm_users(tenants: List[str]) -> int:
+    # Недавно активные пользователи читаются тем же путём, что и get_or_create_user: по (tenant, tg_id).
+    total = 0
+    async with SessionLocal() as session:
+        for tenant in tenants:
+            q = await session.execute(
+                select(User.tg_id)
+                .where(User.tenant == tenant, User.last_seen_at.isnot(None))
+                .order_by(User.last_seen_at.desc())
+                .limit(STARTUP_WARM_USERS)
+            )
+            tg_ids = q.scalars().all()
+            if tg_ids:
+                await session.execute(select(User).where(User.tenant == tenant, User.tg_id.in_(tg_ids)))
+            total += len(tg_ids)
+    return total
+
+
+async def warm_up(tenants: List[str]) -> None:
+    try:
+        products, users = await asyncio.gather(warm_catalog(tenants), warm_users(tenants))
+    except Exception:
+        # Прогрев — оптимизация: без него бот работает, просто первые запросы медленнее.
+        logger.exception("Прогрев при старте не удался")
+        return
+    logger.info("Прогрето: карточек %s, пользователей %s", products, users)
@@ -5,4 +5,6 @@ class AddCardState(StatesGroup):
     title = State()
     description = State()
     price = State()
+    quantity = State()
+    category = State()
     photo = State()
@@ -0,0 +1,317 @@
+"""Фейковый Telegram Bot API для soak-прогонов.
+
+Отдаёт через getUpdates скриптованный трафик виртуальных пользователей, принимает
+sendMessage / sendPhoto / sendInvoice / deleteMessage и прочие вызовы бота, с заданной
+вероятностью отвечает 429 и считает end-to-end задержку: от постановки апдейта
+в очередь до первого ответа бота этому пользователю. Статистика за окно — GET /_stats.
+
+    python -m soak.fake_api --port 8081 --users 2000
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+
+BOT_ID = 100000
+STEP_TIMEOUT = 30
+# Методы, на которые не инжектим 429: без них бот просто не стартует.
+SERVICE_METHODS = {"getMe", "getUpdates", "deleteWebhook", "close", "logOut"}
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class FakeBotAPI:
+    def __init__(self, users: int, think_time: float, error_rate: float, seed: int):
+        self.users = users
+        self.think_time = think_time
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+        self.updates: asyncio.Queue = asyncio.Queue()
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1)
+        self.query_ids = itertools.count(1)
+
+        self.waiters: Dict[int, asyncio.Future] = {}
+        self.query_owner: Dict[str, int] = {}
+        self.last_message: Dict[int, dict] = {}
+        self.last_invoice: Dict[int, dict] = {}
+
+        self.latencies: List[float] = []
+        self.methods: Counter = Counter()
+        self.injected_429 = 0
+        self.timeouts = 0
+
+    # --- HTTP-сторона: то, что вызывает бот ---
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = dict(await request.post())
+        self.methods[method] += 1
+
+        if method not in SERVICE_METHODS and self.random.random() < self.error_rate:
+            self.injected_429 += 1
+            return web.json_response(
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": "Too Many Requests: retry after 1",
+                    "parameters": {"retry_after": 1},
+                },
+                status=429,
+            )
+
+        if method == "getUpdates":
+            return self.ok(await self.get_updates(params))
+        if method == "getMe":
+            return self.ok({"id": BOT_ID, "is_bot": True, "first_name": "Soak", "username": "soak_bot"})
+        if method in ("sendMessage", "sendPhoto", "sendInvoice", "editMessageReplyMarkup"):
+            return self.ok(self.bot_message(method, params))
+        if method in ("answerCallbackQuery", "answerPreCheckoutQuery"):
+            owner = self.query_owner.pop(params.get(self.query_field(method), ""), None)
+            if owner is not None:
+                self.resolve(owner)
+            return self.ok(True)
+        if method == "createInvoiceLink":
+            return self.ok(f"https://t.me/$soak_{next(self.message_ids)}")
+        # deleteMessage шаг не завершает: при листании бот сначала удаляет старую карточку,
+        # а ответом пользователю считается отправка новой.
+        return self.ok(True)
+
+    @staticmethod
+    def ok(result) -> web.Response:
+        return web.json_response({"ok": True, "result": result})
+
+    @staticmethod
+    def query_field(method: str) -> str:
+        return "callback_query_id" if method == "answerCallbackQuery" else "pre_checkout_query_id"
+
+    async def get_updates(self, params: dict) -> list:
+        timeout = int(params.get("timeout") or 0)
+        limit = int(params.get("limit") or 100)
+        batch = []
+        try:
+            batch.append(await asyncio.wait_for(self.updates.get(), timeout=max(timeout, 0.01)))
+        except asyncio.TimeoutError:
+            return []
+        while len(batch) < limit and not self.updates.empty():
+            batch.append(self.updates.get_nowait())
+        return batch
+
+    def bot_message(self, method: str, params: dict) -> dict:
+        chat_id = int(params["chat_id"])
+        message = {
+            "message_id": int(params.get("message_id") or next(self.message_ids)),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": BOT_ID, "is_bot": True, "first_name": "Soak"},
+        }
+        if method == "editMessageReplyMarkup":
+            message = dict(self.last_message.get(chat_id, message))
+        elif method == "sendPhoto":
+            message["photo"] = [{"file_id": params.get("photo", "photo"), "file_unique_id": "u", "width": 1, "height": 1}]
+            message["caption"] = params.get("caption", "")
+        elif method == "sendInvoice":
+            prices = json.loads(params.get("prices", "[]"))
+            invoice = {
+                "title": params.get("title", ""),
+                "description": params.get("description", ""),
+                "start_parameter": "",
+                "currency": params.get("currency", "RUB"),
+                "total_amount": sum(price["amount"] for price in prices),
+            }
+            message["invoice"] = invoice
+            self.last_invoice[chat_id] = {**invoice, "payload": params.get("payload", "")}
+        else:
+            message["text"] = params.get("text", "")
+
+        if params.get("reply_markup"):
+            message["reply_markup"] = json.loads(params["reply_markup"])
+            self.last_message[chat_id] = message
+        self.resolve(chat_id)
+        return message
+
+    def resolve(self, chat_id: int) -> None:
+        waiter = self.waiters.pop(chat_id, None)
+        if waiter and not waiter.done():
+            waiter.set_result(time.monotonic())
+
+    # --- Сторона виртуальных пользователей ---
+
+    async def step(self, user_id: int, update: dict) -> bool:
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters[user_id] = waiter
+        started = time.monotonic()
+        await self.updates.put({"update_id": next(self.update_ids), **update})
+        try:
+            answered = await asyncio.wait_for(waiter, timeout=STEP_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.waiters.pop(user_id, None)
+            self.timeouts += 1
+            # Таймауты — это и есть хвост распределения, поэтому в перцентили они идут как STEP_TIMEOUT.
+            self.latencies.append(STEP_TIMEOUT)
+            return False
+        self.latencies.append(answered - started)
+        return True
+
+    @staticmethod
+    def user(user_id: int) -> dict:
+        return {"id": user_id, "is_bot": False, "first_name": f"u{user_id}", "username": f"soak{user_id}"}
+
+    def text(self, user_id: int, text: str) -> dict:
+        return {
+            "message": {
+                "message_id": next(self.message_ids),
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": self.user(user_id),
+                "text": text,
+            }
+        }
+
+    def tap(self, user_id: int, prefix: str) -> Optional[dict]:
+        message = self.last_message.get(user_id)
+        if not message:
+            return None
+        buttons = [
+            button["callback_data"]
+            for row in message["reply_markup"].get("inline_keyboard", [])
+            for button in row
+            if button.get("callback_data", "").startswith(prefix)
+        ]
+        if not buttons:
+            return None
+        query_id = str(next(self.query_ids))
+        self.query_owner[query_id] = user_id
+        return {
+            "callback_query": {
+                "id": query_id,
+                "from": self.user(user_id),
+                "chat_instance": str(user_id),
+                "message": message,
+                "data": self.random.choice(buttons),
+            }
+        }
+
+    async def pay(self, user_id: int) -> None:
+        invoice = self.last_invoice.pop(user_id, None)
+        if not invoice:
+            return
+        query_id = str(next(self.query_ids))
+        self.query_owner[query_id] = user_id
+        pre_checkout = {
+            "pre_checkout_query": {
+                "id": query_id,
+                "from": self.user(user_id),
+                "currency": invoice["currency"],
+                "total_amount": invoice["total_amount"],
+                "invoice_payload": invoice["payload"],
+            }
+        }
+        if not await self.step(user_id, pre_checkout):
+            return
+        payment = self.text(user_id, "")
+        del payment["message"]["text"]
+        payment["message"]["successful_payment"] = {
+            "currency": invoice["currency"],
+            "total_amount": invoice["total_amount"],
+            "invoice_payload": invoice["payload"],
+            "telegram_payment_charge_id": f"tg_{query_id}",
+            "provider_payment_charge_id": f"pr_{query_id}",
+        }
+        await self.step(user_id, payment)
+
+    async def think(self) -> None:
+        await asyncio.sleep(self.random.expovariate(1 / self.think_time))
+
+    async def virtual_user(self, user_id: int) -> None:
+        await asyncio.sleep(self.random.uniform(0, self.think_time))
+        await self.step(user_id, self.text(user_id, "/start"))
+        while True:
+            await self.think()
+            if self.random.random() < 0.7:
+                await self.step(user_id, self.text(user_id, "Посмотреть карточки"))
+                for prefix in ["cat_f:", "cat_show:"] + ["prod_next:"] * self.random.randint(1, 5):
+                    update = self.tap(user_id, prefix)
+                    if update:
+                        await self.think()
+                        await self.step(user_id, update)
+                if self.random.random() < 0.2:
+                    update = self.tap(user_id, "prod_buy:")
+                    if update and await self.step(user_id, update):
+                        await self.think()
+                        await self.pay(user_id)
+            else:
+                await self.step(user_id, self.text(user_id, "Баланс"))
+                await self.think()
+                await self.step(user_id, self.text(user_id, "Назад"))
+
+    # --- Статистика ---
+
+    async def stats(self, request: web.Request) -> web.Response:
+        latencies, self.latencies = self.latencies, []
+        methods, self.methods = self.methods, Counter()
+        injected, self.injected_429 = self.injected_429, 0
+        timeouts, self.timeouts = self.timeouts, 0
+        return web.json_response(
+            {
+                "steps": len(latencies),
+                "p50": percentile(latencies, 0.50),
+                "p99": percentile(latencies, 0.99),
+                "max": max(latencies, default=0.0),
+                "timeouts": timeouts,
+                "injected_429": injected,
+                "queued_updates": self.updates.qsize(),
+                "methods": dict(methods),
+            }
+        )
+
+    async def start_users(self, app: web.Application) -> None:
+        app["users"] = [
+            asyncio.create_task(self.virtual_user(BOT_ID + 1 + i)) for i in range(self.users)
+        ]
+
+    async def stop_users(self, app: web.Application) -> None:
+        for task in app["users"]:
+            task.cancel()
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self.handle)
+        app.router.add_get("/_stats", self.stats)
+        app.on_startup.append(self.start_users)
+        app.on_cleanup.append(self.stop_users)
+        return app
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Фейковый Telegram Bot API со скриптованным трафиком")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--users", type=int, default=1000, help="число виртуальных пользователей")
+    parser.add_argument("--think-time", type=float, default=5.0, help="средняя пауза между действиями, с")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="доля вызовов, получающих 429")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    api = FakeBotAPI(args.users, args.think_time, args.error_rate, args.seed)
+    web.run_app(api.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
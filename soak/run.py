@@ -0,0 +1,171 @@
+"""Soak-прогон бота против фейкового Bot API.
+
+Поднимает soak.fake_api отдельным процессом, запускает в этом процессе app.bot.main()
+с TELEGRAM_API_URL на фейковый сервер и раз в --report-interval секунд пишет
+p99 end-to-end задержки, RSS, соединения с БД и число asyncio-задач. Нужна живая
+PostgreSQL из DATABASE_URL / POSTGRES_*.
+
+    python -m soak.run --users 2000 --duration 14400
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Soak-прогон бота против фейкового Bot API")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--think-time", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--duration", type=int, default=3 * 3600, help="длительность прогона, с")
+    parser.add_argument("--report-interval", type=int, default=60)
+    parser.add_argument("--seed-products", type=int, default=500, help="сколько одобренных карточек создать")
+    return parser.parse_args(argv)
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def seed_products(count: int) -> None:
+    from sqlalchemy import insert, select
+
+    from app.config import DEFAULT_TENANT
+    from app.db.session import SessionLocal, init_db
+    from app.db.models import User, Product, ProductCategory, ProductStatus
+
+    await init_db()
+    async with SessionLocal() as session:
+        q = await session.execute(select(User).where(User.tenant == DEFAULT_TENANT, User.tg_id == 1))
+        seller = q.scalar_one_or_none()
+        if not seller:
+            seller = User(tg_id=1, username="soak_seller")
+            session.add(seller)
+            await session.flush()
+        categories = list(ProductCategory)
+        await session.execute(
+            insert(Product),
+            [
+                {
+                    "user_id": seller.id,
+                    "title": f"Soak товар {i}",
+                    "description": "Товар для нагрузочного прогона",
+                    "price": (i % 200 + 1) * 10_00,
+                    "quantity": 1_000_000,
+                    "category": categories[i % len(categories)],
+                    "status": ProductStatus.APPROVED,
+                }
+                for i in range(count)
+            ],
+        )
+        await session.commit()
+
+
+async def db_connections() -> int:
+    from sqlalchemy import text
+
+    from app.db.session import engine
+
+    async with engine.connect() as conn:
+        q = await conn.execute(
+            text("SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()")
+        )
+        return q.scalar_one()
+
+
+async def report(stats_url: str, args: argparse.Namespace) -> None:
+    from app.db.session import engine
+    from app.logger import logger
+
+    baseline_rss = rss_mb()
+    baseline_tasks = len(asyncio.all_tasks())
+    worst_p99 = 0.0
+    started = time.monotonic()
+
+    async with aiohttp.ClientSession() as http:
+        while time.monotonic() - started < args.duration:
+            await asyncio.sleep(args.report_interval)
+            async with http.get(stats_url) as resp:
+                stats = await resp.json()
+            worst_p99 = max(worst_p99, stats["p99"])
+            logger.info(
+                "soak t=%ds шагов=%s p50=%.3fs p99=%.3fs max=%.3fs таймаутов=%s 429=%s очередь=%s "
+                "RSS=%.1fMB (+%.1f) задач=%s (+%s) пул: занято=%s всего=%s, соединений в БД=%s",
+                time.monotonic() - started,
+                stats["steps"],
+                stats["p50"],
+                stats["p99"],
+                stats["max"],
+                stats["timeouts"],
+                stats["injected_429"],
+                stats["queued_updates"],
+                rss_mb(),
+                rss_mb() - baseline_rss,
+                len(asyncio.all_tasks()),
+                len(asyncio.all_tasks()) - baseline_tasks,
+                engine.pool.checkedout(),
+                engine.pool.size(),
+                await db_connections(),
+            )
+
+    logger.info(
+        "soak завершён: худший p99=%.3fs, рост RSS=%.1fMB, рост числа задач=%s",
+        worst_p99,
+        rss_mb() - baseline_rss,
+        len(asyncio.all_tasks()) - baseline_tasks,
+    )
+
+
+async def run(args: argparse.Namespace) -> None:
+    from app import bot as bot_app
+
+    await seed_products(args.seed_products)
+    bot_task = asyncio.create_task(bot_app.main())
+    try:
+        await report(f"http://127.0.0.1:{args.port}/_stats", args)
+    finally:
+        bot_task.cancel()
+        await asyncio.gather(bot_task, return_exceptions=True)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    # app.config читает окружение при импорте, поэтому всё выставляется до импорта app.*
+    os.environ["TELEGRAM_API_URL"] = f"http://127.0.0.1:{args.port}"
+    os.environ["BOT_TOKEN"] = "123456:SOAK"
+
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "soak.fake_api",
+            "--port",
+            str(args.port),
+            "--users",
+            str(args.users),
+            "--think-time",
+            str(args.think_time),
+            "--error-rate",
+            str(args.error_rate),
+        ]
+    )
+    try:
+        time.sleep(1)
+        asyncio.run(run(args))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()